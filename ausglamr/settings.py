@@ -100,6 +100,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# in the database so check_feeds and the admin can invalidate what the web
+# workers have cached. Run createcachetable after migrating.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "ausglamr_cache",
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -162,6 +175,16 @@ EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 EMAIL_PORT = env("EMAIL_PORT")
 EMAIL_USE_SSL = env("EMAIL_USE_SSL")
 
+# bulk email is sent in batches over one connection, pausing between batches
+# to stay under the provider's sending limits
+EMAIL_BATCH_SIZE = env.int("EMAIL_BATCH_SIZE", 50)
+EMAIL_BATCH_PAUSE = env.float("EMAIL_BATCH_PAUSE", 1.0)  # seconds
+
+# feeds
+FEED_MAX_BYTES = env.int("FEED_MAX_BYTES", 5 * 1024 * 1024)
+FEED_TIMEOUT = env.int("FEED_TIMEOUT", 30)  # seconds to download a whole feed
+FEED_CACHE_TIMEOUT = env.int("FEED_CACHE_TIMEOUT", 24 * 60 * 60)  # our own feeds
+
 # mastodon
 MASTODON_ACCESS_TOKEN = env("MASTODON_ACCESS_TOKEN")
 MASTODON_DOMAIN = env("MASTODON_DOMAIN")
@@ -4,6 +4,7 @@
 
 from django.conf import settings
 from django.contrib import admin
+from django.db.models import Avg
 from django.utils import timezone
 
 from . import models
@@ -14,7 +15,10 @@ from . import utilities
 def approve(modeladmin, request, queryset):
     """approve selected"""
     queryset.update(approved=True)
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
+    messages = []
     for instance in queryset:
         instance.announce()
 
@@ -35,20 +39,27 @@ def approve(modeladmin, request, queryset):
                 message += f"<p>You can now optionally <a href='https://{settings.DOMAIN}/register-cfp'>register a call for papers</a>.</p>"
             message += "</body></html>"
 
-            utilities.send_email(subject, message, recipient)
+            messages.append(utilities.make_email(subject, message, recipient))
+
+    utilities.send_messages(messages)
 
 
 @admin.action(description="Unapprove selected")
 def unapprove(modeladmin, request, queryset):
     """unapprove selected"""
     queryset.update(approved=False)
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
 
 @admin.action(description="Suspend selected blogs")
 def suspend(modeladmin, request, queryset):
     """suspend selected blogs"""
     queryset.update(suspended=True)
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
+    messages = []
     for instance in queryset:
         if hasattr(instance, "contact_email"):
             if hasattr(instance, "name"):
@@ -61,14 +72,21 @@ def suspend(modeladmin, request, queryset):
             <p>Your blog {title} has been suspended from AusGLAMR. It may be unsuspended in future once the issue is resolved. If you would like more information, please reply to this email.</p> \
             </body></html>"
 
-            utilities.send_email(subject, message, instance.contact_email)
+            messages.append(
+                utilities.make_email(subject, message, instance.contact_email)
+            )
+
+    utilities.send_messages(messages)
 
 
 @admin.action(description="Unsuspend selected blogs")
 def unsuspend(modeladmin, request, queryset):
     """unsuspend selected blogs"""
     queryset.update(suspended=False, suspension_lifted=timezone.now())
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
+    messages = []
     for instance in queryset:
         if hasattr(instance, "contact_email"):
             if hasattr(instance, "name"):
@@ -81,7 +99,11 @@ def unsuspend(modeladmin, request, queryset):
             <p>The suspension on your blog {title} has been removed on AusGLAMR. Please note that articles published whilst it was suspended will not be added to AusGLAMR retrospectively. If you would like more information, please reply to this email.</p> \
             </body></html>"
 
-            utilities.send_email(subject, message, instance.contact_email)
+            messages.append(
+                utilities.make_email(subject, message, instance.contact_email)
+            )
+
+    utilities.send_messages(messages)
 
 
 @admin.action(description="Confirm selected subscribers")
@@ -100,12 +122,16 @@ def unconfirm(modeladmin, request, queryset):
 def disable(modeladmin, request, queryset):
     """disable selected"""
     queryset.update(active=False)
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
 
 @admin.action(description="Activate selected blogs")
 def activate(modeladmin, request, queryset):
     """un-disable selected"""
     queryset.update(active=True)
+    models.ContentItem.sync(queryset)
+    utilities.invalidate_feeds()
 
 
 @admin.action(description="Send confirmation request to selected subscribers")
@@ -116,8 +142,51 @@ def send_conf_request(modeladmin, request, queryset):
         instance.send_confirmation_email()
 
 
+class FetchStats:
+    """sortable columns for ranking feeds by fetch history"""
+
+    def get_queryset(self, request):
+        """add average fetch stats"""
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                avg_latency=Avg("fetches__latency"), avg_bytes=Avg("fetches__bytes")
+            )
+        )
+
+    @admin.display(description="avg fetch secs", ordering="avg_latency")
+    def avg_latency(self, obj):  # pylint: disable=no-self-use
+        """average time to download the feed"""
+        return round(obj.avg_latency, 2) if obj.avg_latency is not None else None
+
+    @admin.display(description="avg KB", ordering="avg_bytes")
+    def avg_kb(self, obj):  # pylint: disable=no-self-use
+        """average size of the feed"""
+        return round(obj.avg_bytes / 1024) if obj.avg_bytes is not None else None
+
+
+class InvalidatesFeeds:
+    """changes made in the admin show up in cached feeds straight away"""
+
+    def save_model(self, request, obj, form, change):
+        """save and invalidate feeds"""
+        super().save_model(request, obj, form, change)
+        utilities.invalidate_feeds()
+
+    def delete_model(self, request, obj):
+        """delete and invalidate feeds"""
+        super().delete_model(request, obj)
+        utilities.invalidate_feeds()
+
+    def delete_queryset(self, request, queryset):
+        """bulk delete and invalidate feeds"""
+        super().delete_queryset(request, queryset)
+        utilities.invalidate_feeds()
+
+
 @admin.register(models.Blog)
-class Blog(admin.ModelAdmin):
+class Blog(InvalidatesFeeds, FetchStats, admin.ModelAdmin):
     """display settings for blogs"""
 
     list_display = (
@@ -129,13 +198,15 @@ class Blog(admin.ModelAdmin):
         "suspended",
         "failing",
         "active",
+        "avg_latency",
+        "avg_kb",
     )
     ordering = ["approved", "-suspended", "-failing"]
     actions = [approve, unapprove, suspend, unsuspend, activate, disable]
 
 
 @admin.register(models.Article)
-class Article(admin.ModelAdmin):
+class Article(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for articles"""
 
     date_hierarchy = "pubdate"
@@ -147,14 +218,14 @@ class Article(admin.ModelAdmin):
 
 
 @admin.register(models.Tag)
-class Tag(admin.ModelAdmin):
+class Tag(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for tags"""
 
-    list_display = ("name",)
+    list_display = ("name", "total", "last_30_days", "last_90_days")
 
 
 @admin.register(models.Event)
-class Event(admin.ModelAdmin):
+class Event(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for conferences"""
 
     list_display = (
@@ -170,7 +241,7 @@ class Event(admin.ModelAdmin):
 
 
 @admin.register(models.CallForPapers)
-class CallForPapers(admin.ModelAdmin):
+class CallForPapers(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for CFPs"""
 
     list_display = ("name", "event", "approved", "closing_date")
@@ -180,7 +251,7 @@ class CallForPapers(admin.ModelAdmin):
 
 
 @admin.register(models.Group)
-class Group(admin.ModelAdmin):
+class Group(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for groups"""
 
     list_display = ("name", "approved", "category", "description")
@@ -189,7 +260,7 @@ class Group(admin.ModelAdmin):
 
 
 @admin.register(models.Newsletter)
-class Newsletter(admin.ModelAdmin):
+class Newsletter(InvalidatesFeeds, FetchStats, admin.ModelAdmin):
     """display settings for newsletters"""
 
     list_display = (
@@ -198,13 +269,15 @@ class Newsletter(admin.ModelAdmin):
         "announced",
         "failing",
         "active",
+        "avg_latency",
+        "avg_kb",
     )
     ordering = ["approved", "-failing"]
     actions = [approve, unapprove, suspend, activate, disable]
 
 
 @admin.register(models.Edition)
-class Edition(admin.ModelAdmin):
+class Edition(InvalidatesFeeds, admin.ModelAdmin):
     """display settings for editions"""
 
     date_hierarchy = "pubdate"
@@ -215,6 +288,27 @@ class Edition(admin.ModelAdmin):
         return obj.newsletter.name
 
 
+@admin.register(models.FeedFetch)
+class FeedFetch(admin.ModelAdmin):
+    """feed fetch history, slowest first"""
+
+    date_hierarchy = "fetched"
+    list_display = (
+        "source",
+        "fetched",
+        "status",
+        "bytes",
+        "latency",
+        "parse_time",
+        "entries_seen",
+        "entries_ingested",
+        "error",
+    )
+    list_filter = ("status",)
+    list_select_related = ("blog", "newsletter")
+    ordering = ["-latency"]
+
+
 @admin.register(models.ContentWarning)
 class ContentWarning(admin.ModelAdmin):
     """display settings for CWs"""
@@ -248,3 +342,10 @@ class Subscriber(admin.ModelAdmin):
         "confirmed",
     )
     actions = [confirm]
+
+
+@admin.register(models.DigestRun)
+class DigestRun(admin.ModelAdmin):
+    """weekly emails that have been sent"""
+
+    list_display = ("week", "subject", "started", "completed")
@@ -8,3 +8,9 @@ class BlogsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "blogs"
+
+    def ready(self):
+        """connect signal handlers"""
+
+        # pylint: disable=import-outside-toplevel,unused-import
+        from blogs import signals
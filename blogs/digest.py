@@ -0,0 +1,170 @@
+"""the weekly digest email"""
+
+from datetime import timedelta
+import random
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import format_html
+
+from blogs import models
+
+# the body is rendered once with this in place of the footer, then split
+# around it so each subscriber only costs a short string join
+FOOTER = "[[subscriber footer]]"
+
+SUBJECT_EMOJI = [
+    "🍓",
+    "🍒",
+    "🍎",
+    "🍊",
+    "🍍",
+    "🍋",
+    "🍉",
+    "🥝",
+    "🥦",
+    "🥒",
+    "🥕",
+    "🍏",
+    "🍅",
+    "🥬",
+    "🫐",
+    "🍐",
+    "🥗",
+    "☕️",
+    "🚚",
+    "📬",
+    "🍣",
+]
+
+
+def get_opt_out_url(subscriber):
+    """where a subscriber goes to unsubscribe"""
+
+    return f"https://{settings.DOMAIN}/unsubscribe-email/{subscriber.token}/{subscriber.id}"
+
+
+def html_footer(subscriber):
+    """who the email went to and how to stop it"""
+
+    return format_html(
+        "<div style='padding: 20px; width: 100vw; background-color:#eee; margin-top: 100px;text-align:center;'>"
+        "<em><p>This email was sent to <strong>{}</strong> because you subscribed to email updates from <a href='https://{}'>Aus GLAMR</a>.</p>"
+        "<p>You can <a href='{}'>unsubscribe</a> at any time.</p></em></div>",
+        subscriber.email,
+        settings.DOMAIN,
+        get_opt_out_url(subscriber),
+    )
+
+
+def text_footer(subscriber):
+    """plain text version of html_footer"""
+
+    return (
+        "--\n"
+        f"This email was sent to {subscriber.email} because you subscribed to "
+        f"email updates from Aus GLAMR (https://{settings.DOMAIN}).\n"
+        f"You can unsubscribe at any time: {get_opt_out_url(subscriber)}\n"
+    )
+
+
+class Digest:
+    """a rendered weekly digest, ready to address to each subscriber"""
+
+    def __init__(self, subject, html, text):
+        self.subject = subject
+        self.html = html
+        self.text = text
+        self.html_parts = html.split(FOOTER)
+        self.text_parts = text.split(FOOTER)
+
+    @classmethod
+    def from_run(cls, run):
+        """the digest stored on a DigestRun"""
+
+        return cls(run.subject, run.html, run.text)
+
+    def message(self, subscriber, connection=None):
+        """the digest for one subscriber"""
+
+        text = text_footer(subscriber).join(self.text_parts)
+        msg = EmailMultiAlternatives(
+            self.subject,
+            text,
+            settings.DEFAULT_FROM_EMAIL,
+            [subscriber.email],
+            connection=connection,
+        )
+        msg.attach_alternative(
+            html_footer(subscriber).join(self.html_parts), "text/html"
+        )
+        return msg
+
+
+def build_digest(now=None):
+    """render this week's digest"""
+
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=7)
+
+    context = {
+        "articles": models.Article.objects.filter(pubdate__gte=cutoff),
+        "editions": models.Edition.objects.filter(pubdate__gte=cutoff),
+        "blogs": models.Blog.objects.filter(
+            approved=True, active=True, added__gte=cutoff
+        ),
+        "newsletters": models.Newsletter.objects.filter(
+            approved=True, pubdate__gte=cutoff
+        ),
+        "groups": models.Group.objects.filter(approved=True, pubdate__gte=cutoff),
+        "cfps": models.CallForPapers.objects.filter(
+            event__approved=True, closing_date__gte=now.date()
+        ).select_related("event"),
+        "events": models.Event.objects.filter(approved=True, pubdate__gte=cutoff),
+    }
+    # evaluate each queryset once, both templates share the results
+    context = {key: list(queryset) for key, queryset in context.items()}
+    context["has_updates"] = any(context.values())
+    context["footer"] = FOOTER
+
+    emoji = random.choice(SUBJECT_EMOJI)
+    subject = (
+        f"{emoji} Fresh Aus GLAMR updates for the week of {now.day} {now:%B} {now.year}"
+    )
+
+    return Digest(
+        subject,
+        render_to_string("email/weekly.html", context),
+        render_to_string("email/weekly.txt", context),
+    )
+
+
+def start_run(now=None):
+    """this week's DigestRun, with a delivery queued for each subscriber
+
+    the digest is only rendered the first time, a run that is resumed or
+    started by a second worker picks up the stored one
+    """
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    week = today - timedelta(days=today.weekday())
+
+    run = models.DigestRun.objects.filter(week=week).first()
+    if not run:
+        digest = build_digest(now)
+        run, _ = models.DigestRun.objects.get_or_create(
+            week=week,
+            defaults={
+                "subject": digest.subject,
+                "html": digest.html,
+                "text": digest.text,
+            },
+        )
+
+    if not run.completed:
+        run.add_subscribers()
+
+    return run
@@ -0,0 +1,199 @@
+"""download feeds concurrently so they can be parsed and ingested"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from urllib3.exceptions import ReadTimeoutError
+
+from django.conf import settings
+
+from blogs import http_client
+
+try:
+    import brotli  # pylint: disable=unused-import
+
+    accept_encoding = "gzip, deflate, br"
+except ImportError:
+    accept_encoding = "gzip, deflate"
+
+chunk_size = 64 * 1024
+
+
+class FetchError(Exception):
+    """a feed could not be downloaded safely"""
+
+
+class FeedTooLarge(FetchError):
+    """the feed is bigger than settings.FEED_MAX_BYTES"""
+
+
+class FeedTooSlow(FetchError):
+    """the feed took longer than settings.FEED_TIMEOUT to download"""
+
+
+class FetchResult:
+    """the outcome of downloading a single feed"""
+
+    def __init__(
+        self, source, status=None, headers=None, content=None, error=None, latency=None
+    ):
+        self.source = source
+        self.status = status
+        self.headers = headers or {}
+        self.content = content
+        self.error = error
+        self.latency = latency  # seconds
+
+    @property
+    def ok(self):
+        """did we get a feed back?"""
+        return self.error is None
+
+    @property
+    def not_modified(self):
+        """has the feed not changed since we last fetched it?"""
+        return self.status == 304
+
+
+class HostLimiter:
+    """limit the number of simultaneous requests to any one host"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def __call__(self, url):
+        """return the semaphore for the host in this url"""
+
+        host = get_host(url)
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[host]
+
+
+def get_host(url):
+    """the hostname for a url, or an empty string"""
+
+    return urlparse(url).hostname or ""
+
+
+def read_until(response, deadline, url):
+    """yield a streamed response body as it arrives, until the deadline
+
+    each read returns whatever has arrived rather than waiting for a full
+    chunk, and the socket timeout is cut to what is left of the budget, so
+    a feed that trickles in a byte at a time can't outlast FEED_TIMEOUT
+    """
+
+    raw = response.raw
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise FeedTooSlow(f"{url} took more than {settings.FEED_TIMEOUT}s")
+
+        sock = getattr(getattr(raw, "connection", None), "sock", None)
+        if sock:
+            sock.settimeout(remaining)
+
+        try:
+            chunk = raw.read1(chunk_size, decode_content=True)
+        except (ReadTimeoutError, socket.timeout) as e:
+            raise FeedTooSlow(f"{url} took more than {settings.FEED_TIMEOUT}s") from e
+
+        if not chunk:
+            return  # the whole body has arrived
+        yield chunk
+
+
+def download(url, headers=None):
+    """download a url and return the status, headers and body
+
+    the body is streamed so we can give up on feeds that are too big or
+    that trickle in too slowly, rather than tying up a worker
+    """
+
+    request_headers = {"accept-encoding": accept_encoding}
+    request_headers.update(headers or {})
+
+    max_bytes = settings.FEED_MAX_BYTES
+    deadline = time.monotonic() + settings.FEED_TIMEOUT
+
+    with http_client.feed_get(url, headers=request_headers, stream=True) as r:
+        r.raise_for_status()
+
+        length = r.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise FeedTooLarge(f"{url} is {length} bytes")
+
+        body = bytearray()
+        # chunks are decompressed as they arrive, so this also catches
+        # small responses that expand into something enormous
+        for chunk in read_until(r, deadline, url):
+            body.extend(chunk)
+            if len(body) > max_bytes:
+                raise FeedTooLarge(f"{url} is more than {max_bytes} bytes")
+
+        return r.status_code, r.headers, bytes(body)
+
+
+def fetch(source, limiter):
+    """download the feed for a Blog or Newsletter
+    any errors are captured in the result rather than raised"""
+
+    with limiter(source.feed):
+        start = time.monotonic()
+        try:
+            status, headers, content = download(
+                source.feed, headers=source.conditional_headers()
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            response = getattr(e, "response", None)
+            return FetchResult(
+                source,
+                status=getattr(response, "status_code", None),
+                error=e,
+                latency=time.monotonic() - start,
+            )
+        latency = time.monotonic() - start
+
+    headers = {key.lower(): value for key, value in headers.items()}
+    return FetchResult(
+        source, status=status, headers=headers, content=content, latency=latency
+    )
+
+
+def interleave_hosts(sources):
+    """order sources so that feeds on the same host are spread out
+    this stops workers queueing up behind a single busy host"""
+
+    by_host = {}
+    for source in sources:
+        by_host.setdefault(get_host(source.feed), []).append(source)
+
+    return [
+        source
+        for group in zip_longest(*by_host.values())
+        for source in group
+        if source is not None
+    ]
+
+
+def fetch_feeds(sources, workers=8, per_host=2):
+    """download feeds for sources concurrently
+    yields a FetchResult for each source as soon as it is ready"""
+
+    limiter = HostLimiter(per_host)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(fetch, source, limiter)
+            for source in interleave_hosts(sources)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,95 @@
+"""a shared HTTP session for all outbound requests
+
+requests made through here reuse pooled keep-alive connections per host,
+retry connection failures and overloaded servers with backoff, and always
+have a timeout
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+agent = "AusGLAMR/1.0 +https://ausglamr.newcardigan.org"
+timeout = (4, 13)
+
+# the longest we'll wait when a server asks us to come back later
+MAX_RETRY_AFTER = 5  # seconds
+
+
+class CappedRetry(Retry):
+    """honours Retry-After, but never sleeps longer than MAX_RETRY_AFTER"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+# connection errors are retried for any method because nothing was sent
+# read errors and bad statuses are only retried for idempotent methods
+retry = CappedRetry(
+    total=3,
+    connect=2,
+    read=1,
+    status=2,
+    backoff_factor=0.5,
+    status_forcelist=(429, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # hand back the last response for raise_for_status
+)
+
+# feed downloads have their own deadline, so they only retry a failed
+# connection. An overloaded feed is just checked again on a later run
+feed_retry = Retry(
+    total=2,
+    connect=2,
+    read=0,
+    status=0,
+    backoff_factor=0.5,
+    status_forcelist=(),
+    allowed_methods=frozenset(["GET", "HEAD"]),
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+
+
+def make_session(max_retries=retry):
+    """a session with a pool of connections for each host"""
+
+    new_session = requests.Session()
+    new_session.headers["user-agent"] = agent
+
+    adapter = HTTPAdapter(pool_connections=50, pool_maxsize=10, max_retries=max_retries)
+    new_session.mount("https://", adapter)
+    new_session.mount("http://", adapter)
+
+    return new_session
+
+
+# urllib3 connection pools are thread safe, so the fetcher's worker
+# threads can all share this
+session = make_session()
+feed_session = make_session(feed_retry)
+
+
+def get(url, **kwargs):
+    """GET a url using the shared session"""
+
+    kwargs.setdefault("timeout", timeout)
+    return session.get(url, **kwargs)
+
+
+def feed_get(url, **kwargs):
+    """GET a feed using the shared feed session"""
+
+    kwargs.setdefault("timeout", timeout)
+    return feed_session.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    """POST to a url using the shared session"""
+
+    kwargs.setdefault("timeout", timeout)
+    return session.post(url, **kwargs)
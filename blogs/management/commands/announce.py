@@ -1,19 +1,85 @@
 """announce something"""
 
+import logging
+import time
+
 from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from blogs.models import Announcement
 
+# stop draining when Mastodon says we have this many posts left or fewer
+RATE_LIMIT_RESERVE = 5
+
+# if we'd need to wait longer than this between posts, stop and let the
+# next run carry on instead
+MAX_PAUSE = 60
+
+
+def get_pause(response):
+    """seconds to wait before posting again, or None if we should stop
+
+    this spreads whatever is left of the rate limit evenly until it resets
+    """
+
+    if response.status_code == 429:
+        return None
+
+    remaining = response.headers.get("X-RateLimit-Remaining", "")
+    reset = parse_datetime(response.headers.get("X-RateLimit-Reset", ""))
+
+    if not remaining.isdigit() or not reset:
+        return 0
+
+    if int(remaining) <= RATE_LIMIT_RESERVE:
+        return None
+
+    seconds = max((reset - timezone.now()).total_seconds(), 0)
+    pause = seconds / int(remaining)
+
+    return pause if pause <= MAX_PAUSE else None
+
 
 class Command(BaseCommand):
     """the announce command"""
 
-    # we could add arguments but we don't really need any
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Keep announcing until the queue is empty or --limit is reached",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=50,
+            help="Most announcements to send when draining",
+        )
 
     def handle(self, *args, **options):
-        """check for pending announcements and announce the latest"""
+        """check for pending announcements and announce the oldest"""
+
+        limit = options["limit"] if options["drain"] else 1
+        sent = 0
+
+        while sent < limit:
+            announcement = Announcement.claim_next()
+            if not announcement:
+                break
+
+            r = announcement.announce()
+            if r.status_code != 200:
+                logging.error(f"ANNOUNCEMENT FAILED with status {r.status_code}")
+                break
+
+            sent += 1
 
-        announcement = Announcement.objects.filter().order_by("queued").first()
+            pause = get_pause(r)
+            if pause is None:
+                break  # rate limited, the next run can carry on
+            if sent < limit:
+                time.sleep(pause)
 
-        if announcement:
-            announcement.announce()
+        if options["drain"]:
+            logging.info(f"sent {sent} announcements")
@@ -1,22 +1,34 @@
 """call this from cron to run through all the feeds to find new posts"""
 
+import hashlib
 import logging
-import traceback
+import time
 
 from datetime import datetime, timedelta, timezone
 
 import feedparser
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.db.models import Q
 from django.utils import html
 from django.utils import timezone as django_timezone
 
 from blogs import models
+from blogs.fetcher import fetch_feeds
+from blogs.utilities import invalidate_feeds
 
-from django.forms.models import model_to_dict
+# how long to keep FeedFetch records for
+FETCH_HISTORY = timedelta(days=30)
 
-agent = "AusGLAMR/1.0 +https://ausglamr.newcardigan.org"
+OPT_OUT_TAGS = {
+    "notglam",
+    "notglamr",
+    "notausglamblogs",
+    "notausglamr",
+    "notglamblogs",
+    "#notglam",
+}
 
 
 def date_to_tz_aware(date_tuple):
@@ -26,18 +38,240 @@ def date_to_tz_aware(date_tuple):
     return datetime(*date_tuple[0:7], tzinfo=timezone.utc)
 
 
-def get_tags(dictionary):
-    """parse out tags from blog and upsert as tag instances"""
-    tags = []
-    for tag_obj in dictionary:
-        if tag_obj.term.lower() != "uncategorized":
-            tag = models.Tag.objects.filter(name=tag_obj.term.lower()).first()
-            if not tag:
-                tag = models.Tag.objects.create(name=tag_obj.term.lower())
+class TagCache:
+    """tag ids by name, shared across every feed in a check_feeds run"""
 
-            tags.append(tag)
+    def __init__(self):
+        self.ids = {}
 
-    return tags
+    def resolve(self, names):
+        """return a dict of ids for tag names, creating any missing tags
+
+        ignore_conflicts means an overlapping run creating the same tag at
+        the same time is harmless: we just select whichever row won
+        """
+
+        missing = {name for name in names if name not in self.ids}
+
+        if missing:
+            models.Tag.objects.bulk_create(
+                [models.Tag(name=name) for name in missing], ignore_conflicts=True
+            )
+            self.ids.update(
+                models.Tag.objects.filter(name__in=missing).values_list("name", "id")
+            )
+
+        return {name: self.ids[name] for name in names}
+
+
+def get_tag_names(taglist):
+    """normalised tag names from feed entry tags"""
+
+    names = {tag.term.lower()[:100] for tag in taglist if tag.term}
+    names.discard("uncategorized")
+    return names
+
+
+def parse_feed(result):
+    """parse downloaded feed content"""
+
+    # feedparser uses content-location to resolve relative links
+    headers = {"content-location": result.source.feed}
+    headers.update(result.headers)
+
+    return feedparser.parse(result.content, response_headers=headers)
+
+
+def new_entries(model, entries):
+    """feed entries that are not already stored as a model instance
+
+    known urls and guids are looked up in a single query for the whole feed
+    """
+
+    entries = [entry for entry in entries if getattr(entry, "link", None)]
+    urls = {entry.link for entry in entries}
+    guids = {getattr(entry, "id", entry.link) for entry in entries}
+
+    known_urls = set()
+    known_guids = set()
+    for url, guid in model.objects.filter(
+        Q(url__in=urls) | Q(guid__in=guids)
+    ).values_list("url", "guid"):
+        known_urls.add(url)
+        known_guids.add(guid)
+
+    new = []
+    for entry in entries:
+        guid = getattr(entry, "id", entry.link)
+        if entry.link in known_urls or guid in known_guids:
+            continue
+
+        # feeds sometimes list the same entry twice
+        known_urls.add(entry.link)
+        known_guids.add(guid)
+        new.append(entry)
+
+    return new
+
+
+def get_description(entry):
+    """a short plain text description of a feed entry"""
+
+    description = (
+        html.strip_tags(entry.summary)
+        if (hasattr(entry, "summary") and len(entry.summary) > 0)
+        else (
+            html.strip_tags(entry.description)
+            if (hasattr(entry, "description") and len(entry.description))
+            else (
+                html.strip_tags(entry.content[0].value)
+                if (hasattr(entry, "content") and len(entry.content))
+                else None
+            )
+        )
+    )
+
+    return description[:200] + "..." if description else ""
+
+
+def get_post_interval(entries):
+    """roughly how often a feed publishes
+
+    this is the average gap between the latest posts, or the time since
+    the last post if that is longer, so dormant feeds are checked less
+    """
+
+    dates = sorted(
+        (
+            date_to_tz_aware(entry.published_parsed)
+            for entry in entries
+            if getattr(entry, "published_parsed", None)
+        ),
+        reverse=True,
+    )[:10]
+
+    if not dates:
+        return None
+
+    interval = django_timezone.now() - dates[0]
+    if len(dates) > 1:
+        interval = max(interval, (dates[0] - dates[-1]) / (len(dates) - 1))
+
+    return interval if interval > timedelta(0) else None
+
+
+def ingest_articles(blog, data, tag_cache):
+    """create articles for new entries in a parsed blog feed
+
+    all new articles and their tags are written in one transaction
+    """
+
+    articles = []
+    article_tags = []
+
+    for article in new_entries(models.Article, data.entries):
+        if blog.suspension_lifted and (
+            blog.suspension_lifted > date_to_tz_aware(article.updated_parsed)
+        ):
+            continue  # don't ingest posts published prior to suspension being lifted (we should already have older ones from prior to suspension)
+
+        taglist = getattr(article, "tags", None) or getattr(article, "categories", [])
+
+        tags = get_tag_names(taglist)
+
+        # don't include posts with opt out tags
+        if tags & OPT_OUT_TAGS:
+            continue
+
+        author_name = getattr(article, "author", None) or getattr(blog, "author", "")
+
+        articles.append(
+            models.Article(
+                title=article.title,
+                author_name=author_name,
+                url=article.link,
+                description=get_description(article),
+                updateddate=date_to_tz_aware(article.updated_parsed),
+                blog=blog,
+                pubdate=date_to_tz_aware(article.published_parsed),
+                guid=getattr(article, "id", article.link),
+            )
+        )
+        article_tags.append(tags)
+
+    if not articles:
+        return 0
+
+    tag_ids = tag_cache.resolve(set().union(*article_tags))
+
+    with transaction.atomic():
+        models.Article.objects.bulk_create(articles)
+
+        ArticleTag = models.Article.tags.through
+        ArticleTag.objects.bulk_create(
+            [
+                ArticleTag(article_id=instance.id, tag_id=tag_id)
+                for instance, tags in zip(articles, article_tags)
+                for tag_id in {tag_ids[name] for name in tags}
+            ]
+        )
+
+        # bulk_create skips save() and signals, so build search vectors and
+        # the content index once tags exist
+        created = models.Article.objects.filter(
+            pk__in=[instance.id for instance in articles]
+        )
+        models.Article.update_search_vectors(created)
+        models.ContentItem.sync(created)
+
+    cutoff = django_timezone.now() - timedelta(days=3)
+    newish = [instance for instance in articles if instance.pubdate > cutoff]
+
+    for instance, tags in zip(articles, article_tags):
+        if instance.pubdate > cutoff:
+            instance.announce(tag_names=tags)
+
+    if newish:
+        blog.set_success(updateddate=max(instance.updateddate for instance in newish))
+
+    return len(articles)
+
+
+def ingest_editions(newsletter, data):
+    """create editions for new entries in a parsed newsletter feed"""
+
+    editions = [
+        models.Edition(
+            title=edition.title,
+            author_name=getattr(edition, "author", None) or "",
+            url=edition.link,
+            description=get_description(edition),
+            updateddate=date_to_tz_aware(edition.updated_parsed),
+            newsletter=newsletter,
+            pubdate=date_to_tz_aware(edition.published_parsed),
+            guid=getattr(edition, "id", edition.link),
+        )
+        for edition in new_entries(models.Edition, data.entries)
+    ]
+
+    models.Edition.objects.bulk_create(editions)
+    created = models.Edition.objects.filter(
+        pk__in=[instance.id for instance in editions]
+    )
+    models.Edition.update_search_vectors(created)
+    models.ContentItem.sync(created)
+
+    cutoff = django_timezone.now() - timedelta(days=3)
+    for instance in editions:
+        if instance.pubdate > cutoff:
+            instance.announce()
+
+    if data.entries:
+        newsletter.set_success(
+            updateddate=date_to_tz_aware(data.entries[-1].updated_parsed)
+        )
+
+    return len(editions)
 
 
 class Command(BaseCommand):
@@ -59,6 +293,60 @@ class Command(BaseCommand):
             action="store_true",
             help="Only check editions",
         )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Check every feed, not just those that are due",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of feeds to download at the same time",
+        )
+        parser.add_argument(
+            "--per-host",
+            type=int,
+            default=2,
+            help="Number of feeds to download from any one host at the same time",
+        )
+
+    def ingest(self, result, tag_cache, fetch):
+        """parse and ingest a downloaded feed if it has changed
+        records parsing stats on fetch, an unsaved FeedFetch
+        returns the interval between posts if the feed was parsed"""
+
+        source = result.source
+
+        if not result.ok:
+            raise result.error
+
+        if result.not_modified:
+            return None
+
+        content_hash = hashlib.sha256(result.content).hexdigest()
+        if content_hash == source.content_hash:
+            return None  # some servers ignore conditional requests
+
+        start = time.monotonic()
+        data = parse_feed(result)
+        fetch.parse_time = time.monotonic() - start
+        fetch.entries_seen = len(data.entries)
+
+        if isinstance(source, models.Blog):
+            fetch.entries_ingested = ingest_articles(source, data, tag_cache)
+        else:
+            fetch.entries_ingested = ingest_editions(source, data)
+
+        # only store validators once ingest succeeds, so that a
+        # failed run will try again with the full feed next time
+        source.set_validators(
+            etag=result.headers.get("etag"),
+            last_modified=result.headers.get("last-modified"),
+            content_hash=content_hash,
+        )
+
+        return get_post_interval(data.entries)
 
     def handle(self, *args, **options):
         """check feeds and update database"""
@@ -68,194 +356,66 @@ class Command(BaseCommand):
                 f"checking feeds at {django_timezone.localtime(django_timezone.now())}"
             )
 
+        sources = []
+        due = Q()
+        if not options["all"]:
+            due = Q(next_check_at__isnull=True) | Q(
+                next_check_at__lte=django_timezone.now()
+            )
+
         if not options["newsletters"]:
-            blogs = models.Blog.objects.filter(
-                approved=True, suspended=False, active=True
-            ).all()
-            for blog in blogs:
-                try:
-                    data = feedparser.parse(blog.feed, agent=agent)
-
-                    for article in data.entries:
-                        if not models.Article.objects.filter(
-                            Q(url=article.link)
-                            | Q(guid=getattr(article, "id", article.link))
-                        ).exists():
-                            if blog.suspension_lifted and (
-                                blog.suspension_lifted
-                                > date_to_tz_aware(article.updated_parsed)
-                            ):
-                                continue  # don't ingest posts published prior to suspension being lifted (we should already have older ones from prior to suspension)
-
-                            taglist = getattr(article, "tags", None) or getattr(
-                                article, "categories", []
-                            )
-
-                            tags = [tag.term.lower() for tag in taglist]
-
-                            opt_out = False
-                            # don't include posts with opt out tags
-                            for tag in tags:
-                                if (
-                                    len(
-                                        {tag}
-                                        & {
-                                            "notglam",
-                                            "notglamr",
-                                            "notausglamblogs",
-                                            "notausglamr",
-                                            "notglamblogs",
-                                            "#notglam",
-                                        }
-                                    )
-                                    > 0
-                                ):
-                                    opt_out = True
-                                else:
-                                    continue
-
-                            if not opt_out:
-                                author_name = getattr(
-                                    article, "author", None
-                                ) or getattr(blog, "author", "")
-
-                                description = (
-                                    html.strip_tags(article.summary)
-                                    if (
-                                        hasattr(article, "summary")
-                                        and len(article.summary) > 0
-                                    )
-                                    else (
-                                        html.strip_tags(article.description)
-                                        if (
-                                            hasattr(article, "description")
-                                            and len(article.summary)
-                                        )
-                                        else (
-                                            html.strip_tags(article.content[0].value)
-                                            if (
-                                                hasattr(article, "content")
-                                                and len(article.content)
-                                            )
-                                            else None
-                                        )
-                                    )
-                                )
-                                if description:
-                                    desc = description[:200] + "..."
-                                else:
-                                    desc = ""
-
-                                instance = models.Article.objects.create(
-                                    title=article.title,
-                                    author_name=author_name,
-                                    url=article.link,
-                                    description=desc,
-                                    updateddate=date_to_tz_aware(
-                                        article.updated_parsed
-                                    ),
-                                    blog=blog,
-                                    pubdate=date_to_tz_aware(article.published_parsed),
-                                    guid=getattr(article, "id", article.link),
-                                )
-
-                                tags_to_add = get_tags(
-                                    getattr(article, "tags", None)
-                                    or getattr(article, "categories", [])
-                                )
-
-                                for tag in tags_to_add:
-                                    instance.tags.add(tag)
-
-                                instance.save()
-
-                                cutoff = django_timezone.now() - timedelta(days=3)
-                                newish = instance.pubdate > cutoff
-                                if newish:
-                                    instance.announce()
-                                    blog.set_success(
-                                        updateddate=date_to_tz_aware(
-                                            article.updated_parsed
-                                        )
-                                    )
-
-                except Exception as e:
-                    blog.set_failing()
-                    logging.error(f"ERROR WITH BLOG {blog.title} - {blog.url}")
-                    logging.info(article)
-                    logging.error(e)
+            sources.extend(
+                models.Blog.objects.filter(
+                    due, approved=True, suspended=False, active=True
+                )
+            )
 
         if not options["blogs"]:
-            newsletters = models.Newsletter.objects.filter(
-                approved=True, active=True, feed__isnull=False
-            ).all()
-            for newsletter in newsletters:
-                try:
-                    data = feedparser.parse(newsletter.feed, agent=agent)
-
-                    for edition in data.entries:
-                        if not models.Edition.objects.filter(
-                            Q(url=edition.link)
-                            | Q(guid=getattr(edition, "id", edition.link))
-                        ).exists():
-                            author_name = getattr(edition, "author", None) or getattr(
-                                edition, "author", ""
-                            )
-
-                            description = (
-                                html.strip_tags(edition.summary)
-                                if (
-                                    hasattr(edition, "summary") and len(edition.summary)
-                                )
-                                else (
-                                    html.strip_tags(edition.description)
-                                    if (
-                                        hasattr(edition, "description")
-                                        and len(edition.description)
-                                    )
-                                    else (
-                                        html.strip_tags(edition.content[0].value)
-                                        if (
-                                            hasattr(article, "content")
-                                            and len(article.content)
-                                        )
-                                        else None
-                                    )
-                                )
-                            )
-                            if description:
-                                desc = description[:200] + "..."
-                            else:
-                                desc = ""
-
-                            instance = models.Edition.objects.create(
-                                title=edition.title,
-                                author_name=author_name,
-                                url=edition.link,
-                                description=desc,
-                                updateddate=date_to_tz_aware(edition.updated_parsed),
-                                newsletter=newsletter,
-                                pubdate=date_to_tz_aware(edition.published_parsed),
-                                guid=getattr(edition, "id", edition.link),
-                            )
-
-                            instance.save()
-
-                            cutoff = django_timezone.now() - timedelta(days=3)
-                            newish = instance.pubdate > cutoff
-                            if newish:
-                                instance.announce()
-
-                    newsletter.set_success(
-                        updateddate=date_to_tz_aware(edition.updated_parsed)
-                    )
-
-                except Exception as e:
-                    newsletter.set_failing()
-                    logging.error(
-                        f"ERROR WITH NEWSLETTER {newsletter.name} - {newsletter.url}"
-                    )
-                    logging.error(e)
+            sources.extend(
+                models.Newsletter.objects.filter(
+                    due, approved=True, active=True, feed__isnull=False
+                )
+            )
+
+        tag_cache = TagCache()
+
+        results = fetch_feeds(
+            sources, workers=options["workers"], per_host=options["per_host"]
+        )
+
+        # fetching happens in worker threads, but we ingest here in the main
+        # thread as each download completes so that all database work stays
+        # on one connection
+        fetches = []
+
+        for result in results:
+            source = result.source
+            is_blog = isinstance(source, models.Blog)
+            fetch = models.FeedFetch.from_result(result)
+            fetches.append(fetch)
+
+            try:
+                post_interval = self.ingest(result, tag_cache, fetch)
+                source.set_checked(post_interval)
+
+            except Exception as e:
+                fetch.error = str(e)
+                source.set_failing()
+                if is_blog:
+                    logging.error(f"ERROR WITH BLOG {source.title} - {source.url}")
+                else:
+                    logging.error(f"ERROR WITH NEWSLETTER {source.name} - {source.url}")
+                logging.error(e)
+
+        models.FeedFetch.objects.bulk_create(fetches)
+
+        if any(fetch.entries_ingested for fetch in fetches):
+            invalidate_feeds()
+
+        models.Tag.refresh_usage()
+        models.FeedFetch.objects.filter(
+            fetched__lt=django_timezone.now() - FETCH_HISTORY
+        ).delete()
 
         if not options["q"]:
             logging.info(
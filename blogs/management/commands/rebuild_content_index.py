@@ -0,0 +1,19 @@
+"""rebuild the ContentItem index from scratch"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blogs import models
+
+
+class Command(BaseCommand):
+    """the rebuild_content_index command"""
+
+    def handle(self, *args, **options):
+        """replace every ContentItem"""
+
+        with transaction.atomic():
+            models.ContentItem.objects.all().delete()
+            models.ContentItem.rebuild()
+
+        self.stdout.write(f"indexed {models.ContentItem.objects.count()} items")
@@ -1,242 +1,142 @@
 """send the weekly email"""
 
-from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from itertools import repeat
 import logging
-import random
+import smtplib
+import time
 
 from django.conf import settings
-from django.utils import timezone
+from django.core.mail import get_connection
 from django.core.management.base import BaseCommand
+from django.db.models import Min, Q
+from django.utils import timezone
 
 from blogs import models
-from blogs.utilities import send_email
-from blogs.models.utils import GroupType
+from blogs.digest import Digest, start_run
 
 
-class Command(BaseCommand):
-    """the announce command"""
+def next_retry(run):
+    """when the next failed delivery nobody else is working on is due
+
+    None if there are none
+    """
+
+    stale = timezone.now() - models.DigestDelivery.claim_timeout
+    return (
+        run.outstanding()
+        .filter(Q(claimed__isnull=True) | Q(claimed__lt=stale))
+        .aggregate(next_attempt_at=Min("next_attempt_at"))["next_attempt_at"]
+    )
+
+
+def send_shard(connection, digest, deliveries):
+    """send the digest for one shard's deliveries over its own connection
+
+    runs in a worker thread, so it leaves the database alone and returns
+    (delivery, error) pairs for the main thread to record
+    """
 
-    # we could add arguments but we don't really need any
+    results = []
+    for delivery in deliveries:
+        try:
+            connection.open()  # does nothing if it's already open
+            connection.send_messages([digest.message(delivery.subscriber)])
+        except (smtplib.SMTPException, OSError) as e:
+            results.append((delivery, e))
+            # start again with a fresh connection
+            with suppress(smtplib.SMTPException, OSError):
+                connection.close()
+        else:
+            results.append((delivery, None))
+
+    return results
+
+
+class Command(BaseCommand):
+    """the send_weekly_email command
+
+    every send is recorded, so if this dies partway through running it again
+    carries on where it stopped. More than one can run at once
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of SMTP connections to send over at the same time",
+        )
 
     def handle(self, *args, **options):
         """find subscribers and send an update"""
 
-        subscribers = models.Subscriber.objects.filter(confirmed=True)
+        run = start_run()
+        if run.completed:
+            logging.info(f"Weekly email for {run.week} was already sent")
+            return
 
         logging.info(
-            f"Sending weekly emails to {len(subscribers)} subscribers at {timezone.now()}"
+            f"Sending weekly emails to {run.outstanding().count()} subscribers at {timezone.now()}"
         )
 
-        cutoff = timezone.now() - timedelta(days=7)
-        blogs = models.Blog.objects.filter(
-            approved=True, active=True, added__gte=cutoff
-        )
-        articles = models.Article.objects.filter(pubdate__gte=cutoff)
-        events = models.Event.objects.filter(approved=True, pubdate__gte=cutoff)
-        cfps = models.CallForPapers.objects.filter(
-            event__approved=True, closing_date__gte=timezone.now().date()
-        )
-        newsletters = models.Newsletter.objects.filter(
-            approved=True, pubdate__gte=cutoff
+        digest = Digest.from_run(run)
+        workers = max(options["workers"], 1)
+        batch_size = max(settings.EMAIL_BATCH_SIZE, 1) * workers
+        connections = [get_connection() for _ in range(workers)]
+        # failed deliveries have run out of attempts, retried ones will be
+        # tried again
+        sent = failed = retried = 0
+        start = time.perf_counter()
+
+        # subscribers are sharded by id, each shard always goes out over the
+        # same connection
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                deliveries = models.DigestDelivery.claim_batch(run, batch_size)
+
+                if not deliveries:
+                    retry = next_retry(run)
+                    if retry:
+                        # wait out the backoff rather than leave them
+                        time.sleep(max((retry - timezone.now()).total_seconds(), 0))
+                        continue
+                    if not run.outstanding().exists():
+                        run.complete()
+                    break  # anything left is in flight with another process
+
+                shards = [[] for _ in range(workers)]
+                for delivery in deliveries:
+                    shards[delivery.subscriber_id % workers].append(delivery)
+
+                for results in executor.map(
+                    send_shard, connections, repeat(digest), shards
+                ):
+                    for delivery, error in results:
+                        if error:
+                            logging.warning(
+                                f"weekly email to subscriber {delivery.subscriber_id} failed: {error}"
+                            )
+                            delivery.mark_failed(error)
+                            if delivery.attempts >= delivery.max_attempts:
+                                failed += 1
+                            else:
+                                retried += 1
+                        else:
+                            delivery.mark_sent()
+                            sent += 1
+
+                if settings.EMAIL_BATCH_PAUSE:
+                    time.sleep(settings.EMAIL_BATCH_PAUSE)
+
+        for connection in connections:
+            with suppress(smtplib.SMTPException, OSError):
+                connection.close()
+
+        elapsed = time.perf_counter() - start
+        rate = sent / elapsed if elapsed else 0
+        logging.info(
+            f"Weekly emails completed {timezone.now()}, {sent} sent, {failed} failed, {retried} retried "
+            f"with {workers} workers in {elapsed:.1f}s ({rate:.1f} messages/sec)"
         )
-        editions = models.Edition.objects.filter(pubdate__gte=cutoff)
-        groups = models.Group.objects.filter(approved=True, pubdate__gte=cutoff)
-
-        new_blogs = ""
-        for blog in blogs:
-            title_string = f"<h4><a href='{blog.url}'>{blog.title}</a></h4>"
-            author_string = (
-                f"<p><em>{blog.author_name}</em></p>" if blog.author_name else ""
-            )
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{blog.description}</p>"
-            )
-
-            string_list = [title_string, author_string, description_string]
-            string = "".join(string_list)
-
-            new_blogs = new_blogs + string
-
-        if new_blogs != "":
-            new_blogs = (
-                "<h3 style='margin-top:20px;'>New Blogs</h3>" + new_blogs + "<hr/>"
-            )
-
-        new_articles = ""
-        for post in articles:
-            title_string = f"<h4><a href='{post.url}'>{post.title}</a></h4>"
-            author_string = (
-                f"<p><em>{post.author_name}</em></p>" if post.author_name else ""
-            )
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{post.description}</p>"
-            )
-
-            string_list = [title_string, author_string, description_string]
-            string = "".join(string_list)
-
-            new_articles = new_articles + string
-
-        if new_articles != "":
-            new_articles = (
-                "<h3 style='margin-top:20px;'>New Blog Posts</h3>"
-                + new_articles
-                + "<hr/>"
-            )
-
-        new_editions = ""
-        for edition in editions:
-            title_string = f"<h4><a href='{edition.url}'>{edition.title}</a></h4>"
-            author_string = (
-                f"<p><em>{edition.author_name}</em></p>" if edition.author_name else ""
-            )
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{edition.description}</p>"
-            )
-
-            string_list = [title_string, author_string, description_string]
-            string = "".join(string_list)
-
-            new_editions = new_editions + string
-
-        if new_editions != "":
-            new_editions = (
-                "<h3 style='margin-top:20px;'>New Newsletter Editions</h3>"
-                + new_editions
-                + "<hr/>"
-            )
-
-        coming_events = ""
-        for event in events:
-            s_date = event.start_date
-            title_string = f"<h4><a href='{event.url}'>{event.name}</a></h4>"
-            date_string = (
-                f"<p><em>{s_date:%a} {s_date.day} {s_date:%B} {s_date:%Y}</em></p>"
-            )
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{event.description}</p>"
-            )
-
-            string_list = [title_string, date_string, description_string]
-            string = "".join(string_list)
-
-            coming_events = coming_events + string
-
-        if coming_events != "":
-            coming_events = (
-                "<h3 style='margin-top:20px;'>Upcoming Events</h3>"
-                + coming_events
-                + "<hr/>"
-            )
-
-        open_cfps = ""
-        for instance in cfps:
-            c_date = instance.closing_date
-            title_string = (
-                f"<h4><a href='{instance.event.url}'>{instance.name}</a></h4>"
-            )
-            dates_string = f"<p><strong>Closes:</strong><em>{c_date:%a} {c_date.day} {c_date:%B}</em></p>"
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{instance.details}</p>"
-            )
-
-            string_list = [title_string, dates_string, description_string]
-            string = "".join(string_list)
-
-            open_cfps = open_cfps + string
-
-        if open_cfps != "":
-            open_cfps = (
-                "<h3 style='margin-top:20px;'>Open Calls</h3>" + open_cfps + "<hr/>"
-            )
-
-        new_newsletters = ""
-        for instance in newsletters:
-            title_string = f"<h4><a href='{instance.url}'>{instance.name}</a></h4>"
-            author_string = (
-                f"<p><em>{instance.author}</em></p>" if instance.author else ""
-            )
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{instance.description}</p>"
-            )
-            string_list = [title_string, author_string, description_string]
-            string = "".join(string_list)
-
-            new_newsletters = new_newsletters + string
-
-        if new_newsletters != "":
-            new_newsletters = (
-                "<h3 style='margin-top:20px;'>New Newsletters</h3>"
-                + new_newsletters
-                + "<hr/>"
-            )
-
-        new_groups = ""
-        for instance in groups:
-            group_type = GroupType(instance.type).label
-            title_string = f"<h4><a href='{instance.url}'>{instance.name}</a></h4>"
-            register_string = f"<p><em><a href='{instance.registration_url}'>Register</a> to join this {group_type}</em></p>"
-            description_string = (
-                f"<p style='margin-bottom:24px;'>{instance.description}</p>"
-            )
-            string_list = [title_string, register_string, description_string]
-            string = "".join(string_list)
-
-            new_groups = new_groups + string
-
-        if new_groups != "":
-            new_groups = (
-                "<h3 style='margin-top:20px;'>New Groups</h3>" + new_groups + "<hr/>"
-            )
-
-        # Now let's put it all together...
-        dt = timezone.now()
-        choices = [
-            "🍓",
-            "🍒",
-            "🍎",
-            "🍊",
-            "🍍",
-            "🍋",
-            "🍉",
-            "🥝",
-            "🥦",
-            "🥒",
-            "🥕",
-            "🍏",
-            "🍅",
-            "🥬",
-            "🫐",
-            "🍐",
-            "🥗",
-            "☕️",
-            "🚚",
-            "📬",
-            "🍣",
-        ]
-        emoji = random.choice(choices)
-        subject = f"{emoji} Fresh Aus GLAMR updates for the week of {dt.day} {dt:%B} {dt.year}"
-        sections = [
-            new_articles,
-            new_editions,
-            new_blogs,
-            new_newsletters,
-            new_groups,
-            open_cfps,
-            coming_events,
-        ]
-        body = "".join(sections)
-        if body == "":
-            body = "<p>No new updates this week.</p><p>Why not spend some time publishing your own blog post instead?</p>"
-
-        for subscriber in subscribers:
-            opt_out = f"https://{settings.DOMAIN}/unsubscribe-email/{subscriber.token}/{subscriber.id}"
-            start = "<html><body>"
-            footer = f"<div style='padding: 20px; width: 100vw; background-color:#eee; margin-top: 100px;text-align:center;'><em><p>This email was sent to <strong>{subscriber.email}</strong> because you subscribed to email updates from <a href='https://{settings.DOMAIN}'>Aus GLAMR</a>.</p><p>You can <a href='{opt_out}'>unsubscribe</a> at any time.</p></em></div>"
-            end = "</body></html>"
-            parts = [start, body, footer, end]
-            message = "".join(parts)
-
-            send_email(subject, message, subscriber.email)
-
-        logging.info(f"Weekly emails completed {timezone.now()}")
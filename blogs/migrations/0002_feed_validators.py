@@ -0,0 +1,55 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="etag",
+            field=models.CharField(
+                blank=True, editable=False, max_length=1000, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="last_modified",
+            field=models.CharField(
+                blank=True, editable=False, max_length=100, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="etag",
+            field=models.CharField(
+                blank=True, editable=False, max_length=1000, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="last_modified",
+            field=models.CharField(
+                blank=True, editable=False, max_length=100, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0002_feed_validators"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["guid"], name="article_guid_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(fields=["guid"], name="edition_guid_idx"),
+        ),
+    ]
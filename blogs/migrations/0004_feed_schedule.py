@@ -0,0 +1,43 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0003_guid_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="blog",
+            name="failures",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="next_check_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="blog",
+            name="post_interval",
+            field=models.DurationField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="failures",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="next_check_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="post_interval",
+            field=models.DurationField(blank=True, editable=False, null=True),
+        ),
+    ]
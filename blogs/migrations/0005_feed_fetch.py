@@ -0,0 +1,60 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0004_feed_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedFetch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fetched", models.DateTimeField(default=django.utils.timezone.now)),
+                ("status", models.IntegerField(blank=True, null=True)),
+                ("bytes", models.IntegerField(default=0)),
+                ("latency", models.FloatField(blank=True, null=True)),
+                ("parse_time", models.FloatField(blank=True, null=True)),
+                ("entries_seen", models.IntegerField(default=0)),
+                ("entries_ingested", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "blog",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fetches",
+                        to="blogs.blog",
+                    ),
+                ),
+                (
+                    "newsletter",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fetches",
+                        to="blogs.newsletter",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-fetched"],
+            },
+        ),
+    ]
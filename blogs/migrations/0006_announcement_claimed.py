@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0005_feed_fetch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="announcement",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:04
+
+from functools import reduce
+from operator import add
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+# the search fields each model had when this migration was written
+SEARCH_FIELDS = {
+    "article": (("title", "B"), ("description", "C")),
+    "callforpapers": (("name", "B"), ("details", "C")),
+    "edition": (("title", "A"), ("description", "C")),
+    "event": (("name", "A"), ("description", "C")),
+    "group": (("name", "A"), ("description", "C")),
+    "newsletter": (("name", "A"), ("description", "C")),
+}
+
+
+def populate_search_vectors(apps, schema_editor):
+    """build search vectors for everything already in the database"""
+
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model("blogs", model_name)
+        document = reduce(
+            add, (SearchVector(field, weight=weight) for field, weight in fields)
+        )
+
+        if model_name == "article":
+            tagnames = Subquery(
+                model.tags.through.objects.filter(article_id=OuterRef("pk"))
+                .values("article_id")
+                .annotate(names=StringAgg("tag__name", " "))
+                .values("names")
+            )
+            document = SearchVector(tagnames, weight="A") + document
+
+        model.objects.update(search_vector=document)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0006_announcement_claimed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="callforpapers",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="edition",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="newsletter",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="article_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callforpapers",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="cfp_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="edition",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="edition_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="event_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="group",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="group_search_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="newsletter",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="newsletter_search_idx"
+            ),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,165 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:07
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+def listed(instance, title, categories, **fields):
+    """ContentItem fields for an object, as content.py built them when this
+    migration was written"""
+
+    data = {
+        "title": title,
+        "url": instance.url,
+        "guid": instance.url,
+        "description": instance.description,
+        "author_name": getattr(instance, "author_name", None),
+        "pubdate": instance.pubdate,
+        "updateddate": getattr(instance, "updateddate", instance.pubdate),
+        "categories": categories,
+    }
+    data.update(fields)
+    return data
+
+
+def populate_content_items(apps, schema_editor):
+    """index everything that is already listed"""
+
+    def objects(model_name):
+        return apps.get_model("blogs", model_name).objects
+
+    sources = [
+        (
+            "BLOG",
+            objects("Blog").filter(approved=True, active=True, suspended=False),
+            lambda blog: listed(blog, blog.title, [blog.get_category_display()]),
+        ),
+        (
+            "ART",
+            objects("Article").prefetch_related("tags"),
+            lambda article: listed(
+                article, article.title, [tag.name for tag in article.tags.all()]
+            ),
+        ),
+        (
+            "NEWS",
+            objects("Newsletter").filter(approved=True, active=True),
+            lambda newsletter: listed(
+                newsletter,
+                newsletter.name,
+                [newsletter.get_category_display()],
+                pubdate=newsletter.pubdate or newsletter.updateddate,
+            ),
+        ),
+        (
+            "EDN",
+            objects("Edition").all(),
+            lambda edition: listed(edition, edition.title, []),
+        ),
+        (
+            "GRP",
+            objects("Group").filter(approved=True),
+            lambda group: listed(group, group.name, [group.get_category_display()]),
+        ),
+        (
+            "EVT",
+            objects("Event").filter(approved=True),
+            lambda event: listed(event, event.name, [event.get_category_display()]),
+        ),
+        (
+            "CFP",
+            objects("CallForPapers").select_related("event"),
+            lambda cfp: {
+                "title": cfp.name,
+                "url": cfp.event.url,
+                "guid": f"{cfp.event.url}-cfp-{cfp.id}",
+                "description": cfp.details,
+                "pubdate": cfp.pubdate,
+                "updateddate": cfp.pubdate,
+                "categories": [],
+            },
+        ),
+    ]
+
+    ContentItem = apps.get_model("blogs", "ContentItem")
+    for kind, queryset, build in sources:
+        items = []
+        for instance in queryset.iterator(chunk_size=1000):
+            data = build(instance)
+            if data["pubdate"]:
+                items.append(ContentItem(kind=kind, object_id=instance.id, **data))
+        ContentItem.objects.bulk_create(items, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0007_search_vectors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("BLOG", "Blog"),
+                            ("ART", "Article"),
+                            ("NEWS", "Newsletter"),
+                            ("EDN", "Edition"),
+                            ("GRP", "Group"),
+                            ("EVT", "Event"),
+                            ("CFP", "Call for papers"),
+                        ],
+                        max_length=4,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("title", models.CharField(max_length=2000)),
+                ("url", models.URLField(max_length=2000)),
+                ("guid", models.CharField(max_length=2000)),
+                ("description", models.TextField(blank=True, null=True)),
+                (
+                    "author_name",
+                    models.CharField(blank=True, max_length=1000, null=True),
+                ),
+                ("pubdate", models.DateTimeField()),
+                ("updateddate", models.DateTimeField(blank=True, null=True)),
+                (
+                    "categories",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100),
+                        default=list,
+                        size=None,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-pubdate"], name="content_item_pubdate_idx"),
+                    models.Index(
+                        fields=["kind", "-pubdate"],
+                        name="content_item_kind_pubdate_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="contentitem",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "object_id"), name="unique_content_item"
+            ),
+        ),
+        migrations.RunPython(populate_content_items, migrations.RunPython.noop),
+    ]
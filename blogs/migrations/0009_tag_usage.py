@@ -0,0 +1,67 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:14
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def count_tag_usage(apps, schema_editor):
+    """count how many articles use each tag so far"""
+
+    Tag = apps.get_model("blogs", "Tag")
+    ArticleTag = apps.get_model("blogs", "Article").tags.through
+    now = timezone.now()
+
+    def usage(since=None):
+        tagged = ArticleTag.objects.filter(tag_id=OuterRef("pk"))
+        if since:
+            tagged = tagged.filter(article__pubdate__gte=since)
+        return Coalesce(
+            Subquery(
+                tagged.values("tag_id").annotate(count=Count("id")).values("count")
+            ),
+            0,
+        )
+
+    Tag.objects.update(
+        total=usage(),
+        last_30_days=usage(now - timedelta(days=30)),
+        last_90_days=usage(now - timedelta(days=90)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0008_content_item"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="last_30_days",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="last_90_days",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="total",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(fields=["-total"], name="tag_total_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(fields=["-last_30_days"], name="tag_last_30_days_idx"),
+        ),
+        migrations.RunPython(count_tag_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0009_tag_usage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["-pubdate", "-id"], name="article_pubdate_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="edition",
+            index=models.Index(
+                fields=["-pubdate", "-id"], name="edition_pubdate_id_idx"
+            ),
+        ),
+    ]
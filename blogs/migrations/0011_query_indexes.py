@@ -0,0 +1,93 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0010_pubdate_id_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                condition=models.Q(("active", True), ("approved", True)),
+                fields=["category", "-updateddate"],
+                name="blog_listed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                condition=models.Q(("active", True), ("approved", True)),
+                fields=["-updateddate"],
+                name="blog_listed_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                condition=models.Q(
+                    ("active", True), ("approved", True), ("suspended", False)
+                ),
+                fields=["next_check_at"],
+                name="blog_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callforpapers",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["closing_date"],
+                name="cfp_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["start_date"],
+                name="event_upcoming_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="feedfetch",
+            index=models.Index(fields=["-fetched"], name="feedfetch_fetched_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="group",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["name"],
+                name="group_listed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="newsletter",
+            index=models.Index(
+                condition=models.Q(("approved", True)),
+                fields=["name"],
+                name="newsletter_listed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="newsletter",
+            index=models.Index(
+                condition=models.Q(
+                    ("active", True), ("approved", True), ("feed__isnull", False)
+                ),
+                fields=["next_check_at"],
+                name="newsletter_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("confirmed", True)),
+                fields=["id"],
+                name="subscriber_confirmed_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blogs", "0011_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DigestRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week", models.DateField(unique=True)),
+                ("subject", models.CharField(max_length=200)),
+                ("html", models.TextField()),
+                ("text", models.TextField()),
+                ("started", models.DateTimeField(default=django.utils.timezone.now)),
+                ("completed", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DigestDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PEND", "Pending"),
+                            ("SENT", "Sent"),
+                            ("FAIL", "Failed"),
+                        ],
+                        default="PEND",
+                        max_length=4,
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(blank=True, null=True)),
+                ("claimed", models.DateTimeField(blank=True, null=True)),
+                ("sent", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="blogs.digestrun",
+                    ),
+                ),
+                (
+                    "subscriber",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="blogs.subscriber",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="digestdelivery",
+            constraint=models.UniqueConstraint(
+                fields=("run", "subscriber"), name="unique_digest_delivery"
+            ),
+        ),
+    ]
@@ -1,8 +1,16 @@
 """blogs app models"""
 
 from .blog import Article, Blog, Tag
+from .content import ContentItem, ContentKind
 from .event import Event, CallForPapers
+from .fetch import FeedFetch
 from .group import Group
 from .newsletter import Newsletter, Edition
-from .utils import Announcement, Category, ContentWarning, SiteMessage
-from .subscriber import Subscriber
+from .utils import (
+    Announcement,
+    Category,
+    ContentWarning,
+    ContentWarningMatcher,
+    SiteMessage,
+)
+from .subscriber import DeliveryStatus, DigestDelivery, DigestRun, Subscriber
@@ -1,13 +1,19 @@
 """blog models"""
 
+from datetime import timedelta
 import re
 
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
-from .utils import Announcement, Category, ContentWarning
+from .utils import Announcement, Category, ContentWarning, FeedData, Searchable
 
 
 def validate_ap_address(value):
@@ -51,7 +57,7 @@ class BlogData(models.Model):
         super().save(*args, **kwargs)
 
 
-class Blog(BlogData):
+class Blog(BlogData, FeedData):
     """A blog"""
 
     feed = models.URLField(max_length=2000)
@@ -68,6 +74,27 @@ class Blog(BlogData):
     )
     contact_email = models.EmailField(blank=True, null=True)
 
+    class Meta:
+        """indexes for the blog list and for finding feeds due a check"""
+
+        indexes = [
+            models.Index(
+                fields=["category", "-updateddate"],
+                condition=models.Q(approved=True, active=True),
+                name="blog_listed_idx",
+            ),
+            models.Index(
+                fields=["-updateddate"],
+                condition=models.Q(approved=True, active=True),
+                name="blog_listed_updated_idx",
+            ),
+            models.Index(
+                fields=["next_check_at"],
+                condition=models.Q(approved=True, active=True, suspended=False),
+                name="blog_due_idx",
+            ),
+        ]
+
     def announce(self):
         """queue announcement"""
 
@@ -87,9 +114,10 @@ class Blog(BlogData):
         super().save()
 
     def set_failing(self):
-        """set the blog feed as failing"""
+        """set the blog feed as failing and back off from checking it"""
 
         self.failing = True
+        self.schedule_retry()
         super().save()
 
     def set_success(self, updateddate):
@@ -104,28 +132,48 @@ class Blog(BlogData):
         super().save()
 
 
-class Article(BlogData):
+class Article(BlogData, Searchable):
     """A blog post"""
 
     blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name="articles")
     guid = models.CharField(max_length=2000)
     tags = models.ManyToManyField("Tag", related_name="articles")
 
-    # pylint: disable=undefined-variable
-    def announce(self):
-        """queue a blog post announcement"""
-
-        summary = []
-        warnings = ContentWarning.objects.all()
-        for warning in warnings:
-            for text in [self.title, self.description]:
-                label = warning.is_in(text)
-                if label:
-                    summmary.append(label)
-            for tag in self.tags.all():  # pylint: disable=E1133
-                label = warning.is_in(tag.name)
-                if label:
-                    summmary.append(label)
+    search_fields = (("title", "B"), ("description", "C"))
+
+    class Meta:
+        """check_feeds looks up existing articles by guid"""
+
+        indexes = [
+            models.Index(fields=["guid"], name="article_guid_idx"),
+            models.Index(fields=["-pubdate", "-id"], name="article_pubdate_id_idx"),
+            GinIndex(fields=["search_vector"], name="article_search_idx"),
+        ]
+
+    @classmethod
+    def search_document(cls):
+        """tag names are weighted above the title and description"""
+
+        tagnames = Subquery(
+            cls.tags.through.objects.filter(article_id=OuterRef("pk"))
+            .values("article_id")
+            .annotate(names=StringAgg("tag__name", " "))
+            .values("names")
+        )
+        return SearchVector(tagnames, weight="A") + super().search_document()
+
+    def announce(self, tag_names=None):
+        """queue a blog post announcement
+
+        pass tag_names if they are already known, to save looking them up
+        """
+
+        if tag_names is None:
+            tag_names = [tag.name for tag in self.tags.all()]
+
+        summary = ContentWarning.matcher().match(
+            self.title, self.description, *tag_names
+        )
 
         summary_text = ", ".join(summary) if len(summary) > 0 else None
         author = self.blog.activitypub_account_name or self.author_name
@@ -147,6 +195,46 @@ class Tag(models.Model):
 
     name = models.CharField(max_length=100, unique=True)
 
+    # how many articles use this tag, kept by refresh_usage()
+    total = models.IntegerField(default=0, editable=False)
+    last_30_days = models.IntegerField(default=0, editable=False)
+    last_90_days = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        """trending tags are read straight off these indexes"""
+
+        indexes = [
+            models.Index(fields=["-total"], name="tag_total_idx"),
+            models.Index(fields=["-last_30_days"], name="tag_last_30_days_idx"),
+        ]
+
     def __str__(self):
         """display for admin dropdowns"""
         return self.name
+
+    @classmethod
+    def refresh_usage(cls):
+        """recount tag usage for every tag in a single UPDATE
+
+        check_feeds calls this after each run, so the rolling windows move
+        forward even when nothing new was ingested
+        """
+
+        now = timezone.now()
+
+        def usage(since=None):
+            tagged = Article.tags.through.objects.filter(tag_id=OuterRef("pk"))
+            if since:
+                tagged = tagged.filter(article__pubdate__gte=since)
+            return Coalesce(
+                Subquery(
+                    tagged.values("tag_id").annotate(count=Count("id")).values("count")
+                ),
+                0,
+            )
+
+        cls.objects.update(
+            total=usage(),
+            last_30_days=usage(now - timedelta(days=30)),
+            last_90_days=usage(now - timedelta(days=90)),
+        )
@@ -0,0 +1,261 @@
+"""a single index of everything, newest first"""
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .blog import Article, Blog
+from .event import CallForPapers, Event
+from .group import Group
+from .newsletter import Edition, Newsletter
+from .utils import Category
+
+
+class ContentKind(models.TextChoices):
+    """what sort of thing a ContentItem points to"""
+
+    BLOG = "BLOG", _("Blog")
+    ARTICLE = "ART", _("Article")
+    NEWSLETTER = "NEWS", _("Newsletter")
+    EDITION = "EDN", _("Edition")
+    GROUP = "GRP", _("Group")
+    EVENT = "EVT", _("Event")
+    CFP = "CFP", _("Call for papers")
+
+
+def blog_item(blog):
+    """listed while approved, active and not suspended"""
+
+    if not (blog.approved and blog.active and not blog.suspended):
+        return None
+
+    return {
+        "title": blog.title,
+        "url": blog.url,
+        "guid": blog.url,
+        "description": blog.description,
+        "author_name": blog.author_name,
+        "pubdate": blog.pubdate,
+        "updateddate": blog.updateddate,
+        "categories": [Category(blog.category).label],
+    }
+
+
+def article_item(article):
+    """articles are always listed and categorised by tag"""
+
+    return {
+        "title": article.title,
+        "url": article.url,
+        "guid": article.url,
+        "description": article.description,
+        "author_name": article.author_name,
+        "pubdate": article.pubdate,
+        "updateddate": article.updateddate,
+        "categories": [tag.name for tag in article.tags.all()],
+    }
+
+
+def newsletter_item(newsletter):
+    """listed while approved and active"""
+
+    if not (newsletter.approved and newsletter.active):
+        return None
+
+    return {
+        "title": newsletter.name,
+        "url": newsletter.url,
+        "guid": newsletter.url,
+        "description": newsletter.description,
+        "author_name": newsletter.author_name,
+        "pubdate": newsletter.pubdate or newsletter.updateddate,
+        "updateddate": newsletter.updateddate,
+        "categories": [Category(newsletter.category).label],
+    }
+
+
+def edition_item(edition):
+    """editions are always listed, without categories"""
+
+    return {
+        "title": edition.title,
+        "url": edition.url,
+        "guid": edition.url,
+        "description": edition.description,
+        "author_name": edition.author_name,
+        "pubdate": edition.pubdate,
+        "updateddate": edition.updateddate,
+        "categories": [],
+    }
+
+
+def group_item(group):
+    """listed once approved"""
+
+    if not group.approved:
+        return None
+
+    return {
+        "title": group.name,
+        "url": group.url,
+        "guid": group.url,
+        "description": group.description,
+        "pubdate": group.pubdate,
+        "updateddate": group.pubdate,
+        "categories": [Category(group.category).label],
+    }
+
+
+def event_item(event):
+    """listed once approved"""
+
+    if not event.approved:
+        return None
+
+    return {
+        "title": event.name,
+        "url": event.url,
+        "guid": event.url,
+        "description": event.description,
+        "pubdate": event.pubdate,
+        "updateddate": event.pubdate,
+        "categories": [Category(event.category).label],
+    }
+
+
+def cfp_item(cfp):
+    """calls for papers link to their event"""
+
+    return {
+        "title": cfp.name,
+        "url": cfp.event.url,
+        "guid": f"{cfp.event.url}-cfp-{cfp.id}",
+        "description": cfp.details,
+        "pubdate": cfp.pubdate,
+        "updateddate": cfp.pubdate,
+        "categories": [],
+    }
+
+
+# kind, item builder and related objects each builder uses
+SOURCES = {
+    Blog: (ContentKind.BLOG, blog_item, [], []),
+    Article: (ContentKind.ARTICLE, article_item, [], ["tags"]),
+    Newsletter: (ContentKind.NEWSLETTER, newsletter_item, [], []),
+    Edition: (ContentKind.EDITION, edition_item, [], []),
+    Group: (ContentKind.GROUP, group_item, [], []),
+    Event: (ContentKind.EVENT, event_item, [], []),
+    CallForPapers: (ContentKind.CFP, cfp_item, ["event"], []),
+}
+
+# changes to anything else don't affect the index
+LISTED_FIELDS = {
+    "title",
+    "name",
+    "url",
+    "description",
+    "details",
+    "author_name",
+    "pubdate",
+    "updateddate",
+    "category",
+    "approved",
+    "active",
+    "suspended",
+    "event",
+}
+
+
+class ContentItem(models.Model):
+    """a denormalised copy of everything that appears in the combined feed
+
+    the latest of everything is then a single indexed query instead of
+    loading and sorting every table. Rows are kept in step by signals and by
+    calling sync() after bulk_create or queryset.update
+    """
+
+    kind = models.CharField(choices=ContentKind.choices, max_length=4)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=2000)
+    url = models.URLField(max_length=2000)
+    guid = models.CharField(max_length=2000)
+    description = models.TextField(null=True, blank=True)
+    author_name = models.CharField(max_length=1000, null=True, blank=True)
+    pubdate = models.DateTimeField()
+    updateddate = models.DateTimeField(null=True, blank=True)
+    categories = ArrayField(models.CharField(max_length=100), default=list)
+
+    class Meta:
+        """one row per object, read newest first"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"], name="unique_content_item"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["-pubdate"], name="content_item_pubdate_idx"),
+            models.Index(
+                fields=["kind", "-pubdate"], name="content_item_kind_pubdate_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @classmethod
+    def sync(cls, queryset):
+        """update the index for everything in a queryset of source objects"""
+
+        if queryset.model not in SOURCES:
+            return
+
+        kind, build, related, prefetch = SOURCES[queryset.model]
+        queryset = queryset.select_related(*related).prefetch_related(*prefetch)
+
+        items = []
+        unlisted = []
+        for instance in queryset:
+            data = build(instance)
+            if data and data["pubdate"]:
+                items.append(cls(kind=kind, object_id=instance.id, **data))
+            else:
+                unlisted.append(instance.id)
+
+        cls.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=["kind", "object_id"],
+            update_fields=[
+                "title",
+                "url",
+                "guid",
+                "description",
+                "author_name",
+                "pubdate",
+                "updateddate",
+                "categories",
+            ],
+        )
+        cls.objects.filter(kind=kind, object_id__in=unlisted).delete()
+
+    @classmethod
+    def sync_instance(cls, instance):
+        """update the index for a single saved object"""
+
+        cls.sync(type(instance).objects.filter(pk=instance.pk))
+
+    @classmethod
+    def remove(cls, instance):
+        """remove a deleted object from the index"""
+
+        if type(instance) in SOURCES:
+            kind = SOURCES[type(instance)][0]
+            cls.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+    @classmethod
+    def rebuild(cls):
+        """rebuild the whole index"""
+
+        for model in SOURCES:
+            cls.sync(model.objects.all())
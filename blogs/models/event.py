@@ -1,12 +1,13 @@
 """event models"""
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils import timezone
 
-from .utils import Announcement, Category
+from .utils import Announcement, Category, Searchable
 
 
-class Event(models.Model):
+class Event(Searchable):
     """a event"""
 
     name = models.CharField(max_length=100)
@@ -20,6 +21,20 @@ class Event(models.Model):
     contact_email = models.EmailField(blank=True, null=True)
     approved = models.BooleanField(default=False)
 
+    search_fields = (("name", "A"), ("description", "C"))
+
+    class Meta:
+        """search uses the stored search vector"""
+
+        indexes = [
+            GinIndex(fields=["search_vector"], name="event_search_idx"),
+            models.Index(
+                fields=["start_date"],
+                condition=models.Q(approved=True),
+                name="event_upcoming_idx",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.pubdate:
             self.pubdate = timezone.now()
@@ -51,7 +66,7 @@ class Event(models.Model):
         super().save()
 
 
-class CallForPapers(models.Model):
+class CallForPapers(Searchable):
     """a event call for papers/presentations"""
 
     name = models.CharField(
@@ -65,6 +80,20 @@ class CallForPapers(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name="cfp")
     approved = models.BooleanField(default=False)
 
+    search_fields = (("name", "B"), ("details", "C"))
+
+    class Meta:
+        """search uses the stored search vector"""
+
+        indexes = [
+            GinIndex(fields=["search_vector"], name="cfp_search_idx"),
+            models.Index(
+                fields=["closing_date"],
+                condition=models.Q(approved=True),
+                name="cfp_open_idx",
+            ),
+        ]
+
     def announce(self):
         """create a call for papers announcement"""
 
@@ -0,0 +1,63 @@
+"""feed fetch history"""
+
+from django.db import models
+from django.utils import timezone
+
+from .blog import Blog
+from .newsletter import Newsletter
+
+
+class FeedFetch(models.Model):
+    """one poll of a blog or newsletter feed by check_feeds"""
+
+    blog = models.ForeignKey(
+        Blog, null=True, blank=True, on_delete=models.CASCADE, related_name="fetches"
+    )
+    newsletter = models.ForeignKey(
+        Newsletter,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="fetches",
+    )
+    fetched = models.DateTimeField(default=timezone.now)
+    status = models.IntegerField(null=True, blank=True)  # HTTP status
+    bytes = models.IntegerField(default=0)
+    latency = models.FloatField(null=True, blank=True)  # seconds to download
+    parse_time = models.FloatField(null=True, blank=True)  # seconds to parse
+    entries_seen = models.IntegerField(default=0)
+    entries_ingested = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        """most recent first"""
+
+        ordering = ["-fetched"]
+        indexes = [models.Index(fields=["-fetched"], name="feedfetch_fetched_idx")]
+
+    def __str__(self):
+        """display for admin"""
+        return f"{self.source} at {self.fetched}"
+
+    @property
+    def source(self):
+        """the blog or newsletter that was fetched"""
+        return self.blog or self.newsletter
+
+    @classmethod
+    def from_result(cls, result):
+        """start recording a fetch from a fetcher.FetchResult"""
+
+        fetch = cls(
+            status=result.status,
+            bytes=len(result.content or b""),
+            latency=result.latency,
+            error=str(result.error) if result.error else None,
+        )
+
+        if isinstance(result.source, Blog):
+            fetch.blog = result.source
+        else:
+            fetch.newsletter = result.source
+
+        return fetch
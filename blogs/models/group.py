@@ -1,12 +1,13 @@
 """group models"""
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils import timezone
 
-from .utils import Announcement, Category, GroupType
+from .utils import Announcement, Category, GroupType, Searchable
 
 
-class Group(models.Model):
+class Group(Searchable):
     """a group on email, discord, slack etc"""
 
     name = models.CharField(max_length=100)
@@ -21,6 +22,20 @@ class Group(models.Model):
     approved = models.BooleanField(default=False)
     pubdate = models.DateTimeField(null=True, default=timezone.now)
 
+    search_fields = (("name", "A"), ("description", "C"))
+
+    class Meta:
+        """search uses the stored search vector"""
+
+        indexes = [
+            GinIndex(fields=["search_vector"], name="group_search_idx"),
+            models.Index(
+                fields=["name"],
+                condition=models.Q(approved=True),
+                name="group_listed_idx",
+            ),
+        ]
+
     def announce(self):
         """create a group announcement"""
 
@@ -1,12 +1,13 @@
 """newsletter models"""
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils import timezone
 
-from .utils import Announcement, Category
+from .utils import Announcement, Category, FeedData, Searchable
 
 
-class Newsletter(models.Model):
+class Newsletter(FeedData, Searchable):
     """a newsletter"""
 
     name = models.CharField(max_length=100)
@@ -26,6 +27,25 @@ class Newsletter(models.Model):
     updateddate = models.DateTimeField()
     pubdate = models.DateTimeField(null=True, default=None)
 
+    search_fields = (("name", "A"), ("description", "C"))
+
+    class Meta:
+        """search uses the stored search vector"""
+
+        indexes = [
+            GinIndex(fields=["search_vector"], name="newsletter_search_idx"),
+            models.Index(
+                fields=["name"],
+                condition=models.Q(approved=True),
+                name="newsletter_listed_idx",
+            ),
+            models.Index(
+                fields=["next_check_at"],
+                condition=models.Q(approved=True, active=True, feed__isnull=False),
+                name="newsletter_due_idx",
+            ),
+        ]
+
     def __str__(self):
         """display for admin dropdowns"""
         return self.name
@@ -50,9 +70,10 @@ class Newsletter(models.Model):
         super().save(*args, **kwargs)
 
     def set_failing(self):
-        """set the newsletter feed as failing"""
+        """set the newsletter feed as failing and back off from checking it"""
 
         self.failing = True
+        self.schedule_retry()
         super().save()
 
     def set_success(self, updateddate):
@@ -67,7 +88,7 @@ class Newsletter(models.Model):
         super().save()
 
 
-class Edition(models.Model):
+class Edition(Searchable):
     """A newsletter edition"""
 
     title = models.CharField(max_length=2000)
@@ -81,6 +102,17 @@ class Edition(models.Model):
     pubdate = models.DateTimeField(null=True, default=timezone.now)
     guid = models.CharField(max_length=2000)
 
+    search_fields = (("title", "A"), ("description", "C"))
+
+    class Meta:
+        """check_feeds looks up existing editions by guid"""
+
+        indexes = [
+            models.Index(fields=["guid"], name="edition_guid_idx"),
+            models.Index(fields=["-pubdate", "-id"], name="edition_pubdate_id_idx"),
+            GinIndex(fields=["search_vector"], name="edition_search_idx"),
+        ]
+
     def announce(self):
         """queue an edition announcement"""
 
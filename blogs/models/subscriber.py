@@ -1,9 +1,13 @@
 """email subscriptions"""
 
+from datetime import timedelta
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
 from blogs.utilities import send_email
 
@@ -15,6 +19,17 @@ class Subscriber(models.Model):
     confirmed = models.BooleanField(default=False, editable=False)
     token = models.UUIDField(default=uuid.uuid4, editable=False)
 
+    class Meta:
+        """the weekly email only goes to confirmed subscribers"""
+
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(confirmed=True),
+                name="subscriber_confirmed_idx",
+            )
+        ]
+
     def save(self, *args, **kwargs):
         """always reset the token on save"""
 
@@ -39,3 +54,143 @@ class Subscriber(models.Model):
         message = "".join(parts)
 
         send_email(subject, message, recipient)
+
+
+class DigestRun(models.Model):
+    """one week's digest email
+
+    the rendered digest is stored so that a resumed run sends exactly what
+    the first attempt did
+    """
+
+    week = models.DateField(unique=True)  # the Monday it was sent
+    subject = models.CharField(max_length=200)
+    html = models.TextField()
+    text = models.TextField()
+    started = models.DateTimeField(default=timezone.now)
+    completed = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.subject
+
+    def add_subscribers(self):
+        """queue a delivery for every confirmed subscriber without one
+
+        safe to call repeatedly, existing deliveries are left alone
+        """
+
+        subscribers = Subscriber.objects.filter(confirmed=True).values_list(
+            "id", flat=True
+        )
+        DigestDelivery.objects.bulk_create(
+            (
+                DigestDelivery(run=self, subscriber_id=subscriber)
+                for subscriber in subscribers.iterator()
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def outstanding(self):
+        """deliveries that have not been sent and have retries left"""
+
+        return self.deliveries.filter(
+            status__in=[DeliveryStatus.PENDING, DeliveryStatus.FAILED],
+            attempts__lt=DigestDelivery.max_attempts,
+            subscriber__confirmed=True,
+        )
+
+    def complete(self):
+        """mark the run as done"""
+
+        self.completed = timezone.now()
+        self.save(update_fields=["completed"])
+
+
+class DeliveryStatus(models.TextChoices):
+    """where a delivery is up to"""
+
+    PENDING = "PEND", _("Pending")
+    SENT = "SENT", _("Sent")
+    FAILED = "FAIL", _("Failed")
+
+
+class DigestDelivery(models.Model):
+    """a digest email to one subscriber"""
+
+    run = models.ForeignKey(
+        DigestRun, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    subscriber = models.ForeignKey(Subscriber, on_delete=models.CASCADE)
+    status = models.CharField(
+        choices=DeliveryStatus.choices, max_length=4, default=DeliveryStatus.PENDING
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claimed = models.DateTimeField(null=True, blank=True)  # in flight
+    sent = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    # a claim older than this belongs to a worker that died
+    claim_timeout = timedelta(minutes=10)
+
+    # failures are retried after retry_delay, doubling each time
+    retry_delay = timedelta(minutes=1)
+    max_attempts = 5
+
+    class Meta:
+        """one delivery per subscriber per run"""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["run", "subscriber"], name="unique_digest_delivery"
+            )
+        ]
+
+    @classmethod
+    def claim_batch(cls, run, size):
+        """mark up to size deliveries that are due as in flight and return them
+
+        locked rows are skipped, so concurrent workers never claim the same one
+        """
+
+        now = timezone.now()
+        with transaction.atomic():
+            deliveries = list(
+                run.outstanding()
+                .select_for_update(skip_locked=True, of=("self",))
+                .filter(
+                    Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+                    Q(claimed__isnull=True) | Q(claimed__lt=now - cls.claim_timeout),
+                )
+                .select_related("subscriber")
+                .order_by("id")[:size]
+            )
+            cls.objects.filter(id__in=[delivery.id for delivery in deliveries]).update(
+                claimed=now
+            )
+
+        return deliveries
+
+    def mark_sent(self):
+        """record a successful send"""
+
+        self.status = DeliveryStatus.SENT
+        self.sent = timezone.now()
+        self.claimed = None
+        self.error = None
+        self.attempts += 1
+        self.save(update_fields=["status", "sent", "claimed", "error", "attempts"])
+
+    def mark_failed(self, error):
+        """record a failed send and when to try again"""
+
+        delay = self.retry_delay * 2**self.attempts
+        self.attempts += 1
+        self.status = DeliveryStatus.FAILED
+        self.next_attempt_at = timezone.now() + delay
+        self.claimed = None
+        self.error = str(error)
+        self.save(
+            update_fields=["status", "next_attempt_at", "claimed", "error", "attempts"]
+        )
@@ -1,12 +1,19 @@
 """utility models for use in other models"""
 
-import requests
+from datetime import timedelta
+from functools import reduce
+from operator import add
+import re
 
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from blogs import http_client
+
 
 class Category(models.TextChoices):
     """what GLAMR are you"""
@@ -36,31 +43,209 @@ class GroupType(models.TextChoices):
     OTHER = "OTHR", _("group")
 
 
+# how often check_feeds polls a feed, depending on how often it publishes
+DEFAULT_CHECK_INTERVAL = timedelta(hours=1)
+MIN_CHECK_INTERVAL = timedelta(minutes=15)
+MAX_CHECK_INTERVAL = timedelta(days=1)
+MAX_RETRY_INTERVAL = timedelta(days=2)
+
+
+class FeedData(models.Model):
+    """Base data for anything with a feed we poll"""
+
+    # validators from the last successful fetch, sent back as a conditional GET
+    etag = models.CharField(max_length=1000, blank=True, null=True, editable=False)
+    last_modified = models.CharField(
+        max_length=100, blank=True, null=True, editable=False
+    )
+    content_hash = models.CharField(
+        max_length=64, blank=True, null=True, editable=False
+    )
+
+    # polling schedule
+    post_interval = models.DurationField(blank=True, null=True, editable=False)
+    failures = models.IntegerField(default=0, editable=False)
+    next_check_at = models.DateTimeField(blank=True, null=True, editable=False)
+
+    class Meta:
+        """This is an abstract model for common data"""
+
+        abstract = True
+
+    def conditional_headers(self):
+        """headers to send so the server can tell us nothing has changed"""
+
+        headers = {}
+        if self.etag:
+            headers["if-none-match"] = self.etag
+        if self.last_modified:
+            headers["if-modified-since"] = self.last_modified
+        return headers
+
+    def set_validators(self, etag, last_modified, content_hash):
+        """store validators from a feed we have finished ingesting"""
+
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.failing = False
+        self.save(update_fields=["etag", "last_modified", "content_hash", "failing"])
+
+    def check_interval(self):
+        """how long to wait between checks of a healthy feed
+
+        we check about four times for every post, within sensible limits
+        """
+
+        if not self.post_interval:
+            return DEFAULT_CHECK_INTERVAL
+
+        return min(max(self.post_interval / 4, MIN_CHECK_INTERVAL), MAX_CHECK_INTERVAL)
+
+    def retry_interval(self):
+        """back off exponentially from a failing feed"""
+
+        # 2**8 backoffs is already past MAX_RETRY_INTERVAL, and capping the
+        # exponent keeps the timedelta from overflowing
+        return min(MIN_CHECK_INTERVAL * 2 ** min(self.failures, 8), MAX_RETRY_INTERVAL)
+
+    def set_checked(self, post_interval=None):
+        """schedule the next check after a successful fetch"""
+
+        if post_interval:
+            self.post_interval = post_interval
+        self.failures = 0
+        self.failing = False
+        self.next_check_at = timezone.now() + self.check_interval()
+        self.save(
+            update_fields=["post_interval", "failures", "failing", "next_check_at"]
+        )
+
+    def schedule_retry(self):
+        """count a failed fetch and schedule the next attempt"""
+
+        self.failures = (self.failures or 0) + 1
+        self.next_check_at = timezone.now() + self.retry_interval()
+
+
+class Searchable(models.Model):
+    """Base for anything that shows up in search results
+
+    the search document is stored in search_vector so that searches use a
+    GIN index instead of building a tsvector for every row. Subclasses list
+    (field, weight) pairs in search_fields and add the index in their Meta.
+    """
+
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    search_fields = ()
+
+    class Meta:
+        """This is an abstract model for common data"""
+
+        abstract = True
+
+    @classmethod
+    def search_document(cls):
+        """the expression used to build search_vector"""
+
+        return reduce(
+            add,
+            (SearchVector(field, weight=weight) for field, weight in cls.search_fields),
+        )
+
+    @classmethod
+    def update_search_vectors(cls, queryset=None):
+        """rebuild stored search vectors, for everything by default
+
+        call this after bulk_create or queryset.update, which skip save()
+        """
+
+        if queryset is None:
+            queryset = cls.objects.all()
+        queryset.update(search_vector=cls.search_document())
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {
+            field for field, _weight in self.search_fields
+        } & set(update_fields):
+            return  # nothing searchable changed
+
+        self.update_search_vectors(type(self).objects.filter(pk=self.pk))
+
+
 class Announcement(models.Model):
     """an announcement on Mastodon"""
 
     status = models.TextField()
     summary = models.TextField(null=True)
     queued = models.DateTimeField(default=timezone.now)
+    claimed = models.DateTimeField(null=True, blank=True)  # in flight
+
+    # a claim older than this belongs to a run that died
+    claim_timeout = timedelta(minutes=10)
 
     def save(self, *args, **kwargs):
         if not self.queued:
             self.queued = timezone.now()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def claim_next(cls):
+        """mark the oldest unclaimed announcement as in flight and return it
+
+        locked rows are skipped, so overlapping runs never claim the same one
+        """
+
+        now = timezone.now()
+        with transaction.atomic():
+            announcement = (
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(claimed__isnull=True) | Q(claimed__lt=now - cls.claim_timeout)
+                )
+                .order_by("queued")
+                .first()
+            )
+            if announcement:
+                announcement.claimed = now
+                announcement.save(update_fields=["claimed"])
+
+        return announcement
+
+    def release(self):
+        """put a claimed announcement back in the queue"""
+
+        self.claimed = None
+        self.save(update_fields=["claimed"])
+
     def announce(self):
-        """tell the world about it"""
+        """tell the world about it
+
+        returns the response so callers can check rate limits
+        """
 
         key = settings.MASTODON_ACCESS_TOKEN
-        headers = {"Authorization": f"Bearer {key}"}
+        headers = {
+            "Authorization": f"Bearer {key}",
+            # Mastodon ignores a repeat of the same key for an hour
+            "Idempotency-Key": f"ausglamr-announcement-{self.id}",
+        }
         params = {"status": self.status}
         if self.summary:
             params["spoiler_text"] = self.summary
 
         url = f"{settings.MASTODON_DOMAIN}/api/v1/statuses"
-        r = requests.post(url, data=params, headers=headers, timeout=(4, 13))
+        r = http_client.post(url, data=params, headers=headers)
         if r.status_code == 200:
             self.delete()
+        elif self.claimed:
+            self.release()
+
+        return r
 
 
 class ContentWarning(models.Model):
@@ -77,6 +262,78 @@ class ContentWarning(models.Model):
             warning = self.display
         return warning
 
+    @classmethod
+    def matcher(cls):
+        """a ContentWarningMatcher for every warning
+
+        built on first use and kept until a warning is saved or deleted
+        """
+
+        global _content_warning_matcher  # pylint: disable=global-statement
+
+        if _content_warning_matcher is None:
+            _content_warning_matcher = ContentWarningMatcher(
+                cls.objects.order_by("id").values_list("match_text", "display")
+            )
+        return _content_warning_matcher
+
+    @classmethod
+    def clear_matcher(cls):
+        """rebuild the matcher next time it is used"""
+
+        global _content_warning_matcher  # pylint: disable=global-statement
+
+        _content_warning_matcher = None
+
+
+class ContentWarningMatcher:
+    """finds every content warning in some text in a single pass
+
+    all the match texts are combined into one regex. It is a lookahead so
+    it tries every position, and takes the longest match text there, so
+    each match text also counts for any shorter match texts it starts with
+    """
+
+    def __init__(self, warnings):
+        texts = {}
+        self.order = {}  # display texts, in the order the warnings were created
+        for match_text, display in warnings:
+            if match_text and display:
+                texts.setdefault(match_text, []).append(display)
+                self.order.setdefault(display, len(self.order))
+
+        self.matches = {
+            text: {
+                display
+                for prefix, displays in texts.items()
+                if text.startswith(prefix)
+                for display in displays
+            }
+            for text in texts
+        }
+
+        alternatives = "|".join(
+            re.escape(text) for text in sorted(texts, key=len, reverse=True)
+        )
+        self.pattern = re.compile(f"(?=({alternatives}))") if texts else None
+
+    def match(self, *texts):
+        """display text of each warning found in any of texts, without repeats"""
+
+        if not self.pattern:
+            return []
+
+        found = set()
+        for text in texts:
+            if text:
+                for match in self.pattern.finditer(text.lower()):
+                    found.update(self.matches[match.group(1)])
+
+        return sorted(found, key=self.order.get)
+
+
+_content_warning_matcher = None
+
 
 class SiteMessage(models.Model):
     """A message to be displayed somewhere"""
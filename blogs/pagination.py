@@ -0,0 +1,93 @@
+"""keyset pagination for lists ordered newest first
+
+instead of counting every row and skipping over earlier pages with OFFSET,
+each page starts from the (pubdate, id) of the last item on the page before.
+With an index on (-pubdate, -id) every page costs the same, however deep.
+"""
+
+from datetime import datetime
+
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(item):
+    """a url-safe cursor pointing at an item"""
+
+    return urlsafe_base64_encode(force_bytes(f"{item.pubdate.isoformat()}|{item.id}"))
+
+
+def decode_cursor(cursor):
+    """the pubdate and id in a cursor, or None if it is not valid"""
+
+    try:
+        pubdate, pk = force_str(urlsafe_base64_decode(cursor)).split("|")
+        return datetime.fromisoformat(pubdate), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """a page of items, newest first, with cursors to the pages either side"""
+
+    def __init__(self, items, has_next, has_previous):
+        self.object_list = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def next_cursor(self):
+        """cursor for the page after this one"""
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        """cursor for the page before this one"""
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+def get_keyset_page(queryset, after=None, before=None, per_page=10):
+    """a page of a queryset ordered by pubdate then id, newest first
+
+    after and before are cursors from a previous page. Each page is one
+    query: we fetch an extra row to find out whether there is another page.
+    """
+
+    queryset = queryset.filter(pubdate__isnull=False)
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+
+    if before:
+        pubdate, pk = before
+        rows = list(
+            queryset.filter(pubdate__gte=pubdate)
+            .exclude(pubdate=pubdate, id__lte=pk)
+            .order_by("pubdate", "id")[: per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, has_next=True, has_previous=has_previous)
+
+    if after:
+        pubdate, pk = after
+        queryset = queryset.filter(pubdate__lte=pubdate).exclude(
+            pubdate=pubdate, id__gte=pk
+        )
+
+    rows = list(queryset.order_by("-pubdate", "-id")[: per_page + 1])
+    return KeysetPage(
+        rows[:per_page], has_next=len(rows) > per_page, has_previous=bool(after)
+    )
@@ -0,0 +1,84 @@
+"""search across every kind of content in a single query"""
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import CharField, F, Value
+
+from blogs import models
+
+# the least relevant match we bother showing
+MIN_RANK = 0.1
+
+
+def searchable():
+    """querysets for each kind of searchable content, by name
+
+    these are also used to load the full objects for a page of results
+    """
+
+    return {
+        "article": models.Article.objects.select_related("blog").prefetch_related(
+            "tags"
+        ),
+        "event": models.Event.objects.filter(approved=True),
+        "cfp": models.CallForPapers.objects.filter(approved=True).select_related(
+            "event"
+        ),
+        "newsletter": models.Newsletter.objects.filter(approved=True),
+        "edition": models.Edition.objects.all(),
+        "group": models.Group.objects.filter(approved=True),
+    }
+
+
+def search(query):
+    """rank everything matching a query
+
+    returns a queryset of kind, id and rank dicts, best match first. It is a
+    UNION so counting and slicing it for a page both happen in the database
+    """
+
+    search_query = SearchQuery(query or "")
+    rank = SearchRank(F("search_vector"), search_query)
+
+    # search_vector is stored and GIN indexed, so the match is an index
+    # lookup and only matching rows are ranked
+    querysets = [
+        queryset.prefetch_related(None)
+        .filter(search_vector=search_query)
+        .annotate(kind=Value(kind, output_field=CharField()), rank=rank)
+        .filter(rank__gte=MIN_RANK)
+        .order_by()
+        .values("kind", "id", "rank")
+        for kind, queryset in searchable().items()
+    ]
+
+    return querysets[0].union(*querysets[1:], all=True).order_by("-rank", "kind", "id")
+
+
+def load_results(rows):
+    """the objects for a page of search results, in rank order"""
+
+    ids = {}
+    for row in rows:
+        ids.setdefault(row["kind"], []).append(row["id"])
+
+    objects = {}
+    for kind, queryset in searchable().items():
+        if kind in ids:
+            for item in queryset.filter(id__in=ids[kind]):
+                objects[(kind, item.id)] = item
+
+    items = []
+    for row in rows:
+        item = objects.get((row["kind"], row["id"]))
+        if not item:
+            continue  # deleted since we searched
+
+        item.rank = row["rank"]
+        if hasattr(item, "category"):
+            item.category_name = models.Category(item.category).label
+        if hasattr(item, "event"):
+            item.category = models.Category(item.event.category)
+            item.category_name = models.Category(item.event.category).label
+        items.append(item)
+
+    return items
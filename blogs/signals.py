@@ -0,0 +1,65 @@
+"""keep denormalised data up to date when models change"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from blogs import models
+from blogs.models.content import LISTED_FIELDS, SOURCES
+
+
+@receiver(m2m_changed, sender=models.Article.tags.through)
+def article_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """tag names are part of an article's search vector"""
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        articles = models.Article.objects.filter(pk=instance.pk)
+    elif pk_set:
+        articles = models.Article.objects.filter(pk__in=pk_set)
+    else:
+        return  # the articles for a cleared tag are already gone
+
+    models.Article.update_search_vectors(articles)
+    models.ContentItem.sync(articles)
+
+
+@receiver(post_save, sender=models.Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """a renamed tag changes the search vector of its articles"""
+
+    if not created:
+        models.Article.update_search_vectors(instance.articles.all())
+        models.ContentItem.sync(instance.articles.all())
+
+
+@receiver(post_save)
+def content_saved(sender, instance, update_fields=None, **kwargs):
+    """keep the ContentItem index in step with anything it lists"""
+
+    if sender not in SOURCES:
+        return
+
+    if update_fields is not None and not LISTED_FIELDS & set(update_fields):
+        return
+
+    models.ContentItem.sync_instance(instance)
+
+    if sender is models.Event:
+        models.ContentItem.sync(instance.cfp.all())  # cfps use the event url
+
+
+@receiver(post_delete)
+def content_deleted(sender, instance, **kwargs):
+    """drop deleted objects from the ContentItem index"""
+
+    models.ContentItem.remove(instance)
+
+
+@receiver(post_save, sender=models.ContentWarning)
+@receiver(post_delete, sender=models.ContentWarning)
+def content_warning_changed(sender, **kwargs):
+    """the cached matcher is out of date"""
+
+    models.ContentWarning.clear_matcher()
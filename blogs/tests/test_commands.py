@@ -6,8 +6,11 @@ from unittest.mock import patch
 
 from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone as django_timezone
 
 from blogs import models
+from blogs.management.commands.check_feeds import TagCache, new_entries
+from blogs.utilities import get_feed_cache_generation
 
 
 class FeedParserItemMock(object):
@@ -158,6 +161,9 @@ class CommandsTestCase(TestCase):
         self.feedparser_new = FeedParserMock(entries=[article_four])
         self.feedparser_edition = FeedParserMock(entries=[edition])
 
+        self.response = (200, {}, b"<rss></rss>")
+        self.response_new = (200, {}, b"<rss><item></item></rss>")
+
     def test_check_feeds(self):
         """test parse a feed for basic blog info"""
 
@@ -167,7 +173,11 @@ class CommandsTestCase(TestCase):
         self.assertEqual(models.Article.objects.count(), 0)
         self.assertEqual(models.Tag.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        generation = get_feed_cache_generation()
+
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             value = call_command("check_feeds", *args, **opts)
 
             self.assertEqual(models.Article.objects.count(), 1)
@@ -175,6 +185,26 @@ class CommandsTestCase(TestCase):
             article = models.Article.objects.all().first()
             self.assertEqual(article.title, "My amazing blog post")
 
+            # bulk created articles are still searchable
+            self.assertTrue(
+                models.Article.objects.filter(search_vector="amazing").exists()
+            )
+
+            # tag usage is counted
+            self.assertEqual(
+                sorted(models.Tag.objects.values_list("total", flat=True)), [1, 1]
+            )
+
+            # cached feeds are invalidated
+            self.assertNotEqual(get_feed_cache_generation(), generation)
+
+            # and listed in the combined feed
+            self.assertTrue(
+                models.ContentItem.objects.filter(
+                    kind=models.ContentKind.ARTICLE, object_id=article.id
+                ).exists()
+            )
+
             # should be set to be announced
             self.assertEqual(models.Announcement.objects.count(), 1)
 
@@ -186,7 +216,9 @@ class CommandsTestCase(TestCase):
 
         self.assertEqual(models.Edition.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser_edition):
+        with patch("feedparser.parse", return_value=self.feedparser_edition), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             value = call_command("check_feeds", *args, **opts)
 
             self.assertEqual(models.Edition.objects.count(), 1)
@@ -205,7 +237,9 @@ class CommandsTestCase(TestCase):
         self.assertEqual(models.Article.objects.count(), 0)
         self.assertEqual(models.Tag.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             call_command("check_feeds", *args, **opts)
 
             self.assertEqual(models.Article.objects.count(), 1)
@@ -213,7 +247,9 @@ class CommandsTestCase(TestCase):
             article = models.Article.objects.all().first()
             self.assertEqual(article.title, "My amazing blog post")
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             call_command("check_feeds", *args, **opts)
 
             self.assertEqual(models.Article.objects.count(), 1)
@@ -228,7 +264,9 @@ class CommandsTestCase(TestCase):
         self.assertEqual(models.Article.objects.count(), 0)
         self.assertEqual(models.Tag.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             call_command("check_feeds", *args, **opts)
 
             self.assertEqual(models.Article.objects.count(), 1)
@@ -236,8 +274,10 @@ class CommandsTestCase(TestCase):
             article = models.Article.objects.all().first()
             self.assertEqual(article.title, "My amazing blog post")
 
-        with patch("feedparser.parse", return_value=self.feedparser_new):
-            call_command("check_feeds", *args, **opts)
+        with patch("feedparser.parse", return_value=self.feedparser_new), patch(
+            "blogs.fetcher.download", return_value=self.response_new
+        ):
+            call_command("check_feeds", "--all", *args, **opts)
 
             self.assertEqual(models.Article.objects.count(), 2)
             self.assertEqual(models.Tag.objects.count(), 2)
@@ -253,7 +293,9 @@ class CommandsTestCase(TestCase):
         self.assertEqual(models.Article.objects.count(), 0)
         self.assertEqual(models.Tag.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser_old):
+        with patch("feedparser.parse", return_value=self.feedparser_old), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             value = call_command("check_feeds", *args, **opts)
 
             # should be ingested
@@ -269,7 +311,9 @@ class CommandsTestCase(TestCase):
         self.assertEqual(models.Article.objects.count(), 0)
         self.assertEqual(models.Tag.objects.count(), 0)
 
-        with patch("feedparser.parse", return_value=self.feedparser_exclude):
+        with patch("feedparser.parse", return_value=self.feedparser_exclude), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": True, "-blogs": True}
             opts = {}
 
@@ -287,7 +331,9 @@ class CommandsTestCase(TestCase):
         self.blog.approved = False
         self.blog.save()
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": True, "-blogs": True}
             opts = {}
 
@@ -305,7 +351,9 @@ class CommandsTestCase(TestCase):
         self.blog.active = False
         self.blog.save()
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": True, "-blogs": True}
             opts = {}
 
@@ -323,7 +371,9 @@ class CommandsTestCase(TestCase):
         self.blog.suspended = True
         self.blog.save()
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": True, "-blogs": True}
             opts = {}
 
@@ -342,7 +392,9 @@ class CommandsTestCase(TestCase):
         self.blog.suspension_lifted = datetime.now(timezone.utc) - timedelta(minutes=1)
         self.blog.save()
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": False}
             opts = {}
 
@@ -363,7 +415,9 @@ class CommandsTestCase(TestCase):
         )
         self.blog.save()
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
             args = {"-q": False}
             opts = {}
 
@@ -371,3 +425,250 @@ class CommandsTestCase(TestCase):
 
             self.assertEqual(models.Article.objects.count(), 1)
             self.assertEqual(models.Tag.objects.count(), 2)
+
+    def test_check_feeds_download_error(self):
+        """test a feed that cannot be downloaded is marked as failing"""
+
+        with patch("blogs.fetcher.download", side_effect=Exception("timed out")):
+            args = {"-q": True, "-blogs": True}
+            opts = {}
+
+            call_command("check_feeds", *args, **opts)
+
+            self.blog.refresh_from_db()
+            self.assertTrue(self.blog.failing)
+            self.assertEqual(models.Article.objects.count(), 0)
+
+    def test_check_feeds_workers(self):
+        """test feeds are ingested when downloaded concurrently"""
+
+        models.Blog.objects.create(
+            title="Another blog",
+            url="https://other.test",
+            feed="https://other.test/feed.xml",
+            category="LIB",
+            approved=True,
+        )
+
+        feeds = {
+            "https://test.com/feed.xml": self.feedparser,
+            "https://other.test/feed.xml": self.feedparser_new,
+        }
+
+        def download(url, headers=None):
+            return 200, {}, url.encode()
+
+        def parse(content, **kwargs):
+            return feeds[content.decode()]
+
+        with patch("feedparser.parse", side_effect=parse), patch(
+            "blogs.fetcher.download", side_effect=download
+        ):
+            call_command("check_feeds", "-q", "-blogs", "--workers", "2")
+
+            self.assertEqual(models.Article.objects.count(), 2)
+
+    def test_check_feeds_conditional_get(self):
+        """test validators are stored and sent back on the next fetch"""
+
+        response = (200, {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024"}, b"")
+
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=response
+        ):
+            call_command("check_feeds", "-q", "-blogs")
+
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.etag, '"abc"')
+        self.assertEqual(self.blog.last_modified, "Mon, 01 Jan 2024")
+        self.assertEqual(
+            self.blog.conditional_headers(),
+            {"if-none-match": '"abc"', "if-modified-since": "Mon, 01 Jan 2024"},
+        )
+
+        with patch("feedparser.parse") as parse, patch(
+            "blogs.fetcher.download", return_value=(304, {}, b"")
+        ) as download:
+            call_command("check_feeds", "-q", "-blogs", "--all")
+
+            download.assert_called_once_with(
+                "https://test.com/feed.xml", headers=self.blog.conditional_headers()
+            )
+            parse.assert_not_called()
+
+    def test_check_feeds_unchanged_content(self):
+        """test a feed with the same content is not parsed again"""
+
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
+            call_command("check_feeds", "-q", "-blogs")
+
+        with patch("feedparser.parse") as parse, patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
+            call_command("check_feeds", "-q", "-blogs", "--all")
+
+            parse.assert_not_called()
+
+    def test_new_entries(self):
+        """test known entries are found in a single query"""
+
+        models.Article.objects.create(
+            title="Known by url",
+            url="https://test.com/1",
+            blog=self.blog,
+            guid="not-the-same",
+        )
+        models.Article.objects.create(
+            title="Known by guid",
+            url="https://test.com/moved",
+            blog=self.blog,
+            guid="999",
+        )
+
+        entries = (
+            self.feedparser.entries
+            + self.feedparser_exclude.entries
+            + self.feedparser_new.entries
+            + self.feedparser_new.entries
+        )
+
+        with self.assertNumQueries(1):
+            new = new_entries(models.Article, entries)
+
+        self.assertEqual([entry.link for entry in new], ["https://test.com/3"])
+
+    def test_check_feeds_backfill(self):
+        """test a backfill of many posts is ingested with tags in one batch"""
+
+        tag = FeedParserTagMock(term="Libraries")
+        entries = [
+            FeedParserItemMock(
+                title=f"Post {i}",
+                tags=[tag, FeedParserTagMock(term="libraries")],
+                author="Hugh Rundle",
+                link=f"https://test.com/backfill/{i}",
+                summary="",
+                updated_parsed=(2023, 1, 3, 19, 48, 21, 3, 1, 0),
+                published_parsed=(2023, 1, 3, 19, 48, 21, 3, 1, 0),
+                id=f"backfill-{i}",
+            )
+            for i in range(25)
+        ]
+
+        with patch("feedparser.parse", return_value=FeedParserMock(entries)), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
+            call_command("check_feeds", "-q", "-blogs")
+
+        self.assertEqual(models.Article.objects.count(), 25)
+        self.assertEqual(models.Article.tags.through.objects.count(), 25)
+        article = models.Article.objects.get(url="https://test.com/backfill/3")
+        self.assertEqual([tag.name for tag in article.tags.all()], ["libraries"])
+
+    def test_tag_cache(self):
+        """test tags are created in bulk and cached for the run"""
+
+        models.Tag.objects.create(name="python")
+        tag_cache = TagCache()
+
+        with self.assertNumQueries(2):
+            ids = tag_cache.resolve({"python", "testing", "glam"})
+
+        self.assertEqual(models.Tag.objects.count(), 3)
+        self.assertEqual(ids["python"], models.Tag.objects.get(name="python").id)
+
+        with self.assertNumQueries(0):
+            tag_cache.resolve({"python", "glam"})
+
+    def test_check_feeds_schedule(self):
+        """test feeds are only checked again once they are due"""
+
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ):
+            call_command("check_feeds", "-q", "-blogs")
+
+        self.blog.refresh_from_db()
+        self.assertGreater(self.blog.next_check_at, django_timezone.now())
+        self.assertEqual(self.blog.failures, 0)
+
+        with patch("blogs.fetcher.download") as download:
+            call_command("check_feeds", "-q", "-blogs")
+            download.assert_not_called()
+
+        self.blog.next_check_at = django_timezone.now() - timedelta(minutes=1)
+        self.blog.save()
+
+        with patch("blogs.fetcher.download", return_value=(304, {}, b"")) as download:
+            call_command("check_feeds", "-q", "-blogs")
+            download.assert_called_once()
+
+    def test_check_feeds_backoff(self):
+        """test failing feeds are checked less and less often"""
+
+        with patch("blogs.fetcher.download", side_effect=Exception("timed out")):
+            call_command("check_feeds", "-q", "-blogs")
+            self.blog.refresh_from_db()
+            first_retry = self.blog.next_check_at
+
+            call_command("check_feeds", "-q", "-blogs", "--all")
+            self.blog.refresh_from_db()
+
+        self.assertEqual(self.blog.failures, 2)
+        self.assertGreater(self.blog.next_check_at, first_retry)
+
+    def test_retry_interval(self):
+        """test the backoff stops growing for long dead feeds"""
+
+        self.blog.failures = 1
+        self.assertEqual(self.blog.retry_interval(), timedelta(minutes=30))
+
+        self.blog.failures = 1000
+        self.assertEqual(self.blog.retry_interval(), timedelta(days=2))
+
+        self.blog.schedule_retry()
+        self.assertEqual(self.blog.failures, 1001)
+
+    def test_post_interval(self):
+        """test the check interval follows how often a feed publishes"""
+
+        self.blog.post_interval = timedelta(hours=8)
+        self.assertEqual(self.blog.check_interval(), timedelta(hours=2))
+
+        self.blog.post_interval = timedelta(minutes=5)
+        self.assertEqual(self.blog.check_interval(), timedelta(minutes=15))
+
+        self.blog.post_interval = timedelta(days=200)
+        self.assertEqual(self.blog.check_interval(), timedelta(days=1))
+
+        self.blog.post_interval = None
+        self.assertEqual(self.blog.check_interval(), timedelta(hours=1))
+
+    def test_check_feeds_records_fetch(self):
+        """test each poll is recorded with its stats"""
+
+        response = (200, {}, b"<rss>12345</rss>")
+
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=response
+        ):
+            call_command("check_feeds", "-q", "-blogs")
+
+        fetch = models.FeedFetch.objects.get()
+        self.assertEqual(fetch.blog, self.blog)
+        self.assertEqual(fetch.status, 200)
+        self.assertEqual(fetch.bytes, 16)
+        self.assertEqual(fetch.entries_seen, 1)
+        self.assertEqual(fetch.entries_ingested, 1)
+        self.assertIsNotNone(fetch.latency)
+        self.assertIsNotNone(fetch.parse_time)
+        self.assertIsNone(fetch.error)
+
+        with patch("blogs.fetcher.download", side_effect=Exception("timed out")):
+            call_command("check_feeds", "-q", "-blogs", "--all")
+
+        fetch = models.FeedFetch.objects.first()
+        self.assertEqual(fetch.error, "timed out")
+        self.assertEqual(fetch.entries_seen, 0)
@@ -1,12 +1,17 @@
 """test management commands"""
 
 from datetime import datetime, timedelta
+import smtplib
+from unittest.mock import Mock, patch
 
+from django.core import mail
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from blogs import models, management
+from blogs.digest import FOOTER, build_digest, start_run
+from blogs.management.commands.announce import get_pause
 
 
 class ManagementTestCase(TestCase):
@@ -64,3 +69,330 @@ class ManagementTestCase(TestCase):
         status = f"Amazing Conf Call for Papers for Amazing Conf is open from {opening_date_str}, closing on {closing_date_str}!\n\nMore info at https://test.com"
 
         self.assertEqual(announcement.status, status)
+
+
+def mastodon_response(status_code=200, remaining=None, reset=None):
+    """a mock response from the Mastodon statuses API"""
+
+    headers = {}
+    if remaining is not None:
+        headers["X-RateLimit-Remaining"] = str(remaining)
+    if reset is not None:
+        headers["X-RateLimit-Reset"] = reset.isoformat()
+    return Mock(status_code=status_code, headers=headers)
+
+
+class AnnounceTestCase(TestCase):
+    """test sending queued announcements"""
+
+    def setUp(self):
+        """queue some announcements"""
+
+        for i in range(5):
+            models.Announcement.objects.create(
+                status=f"announcement {i}",
+                queued=timezone.now() - timedelta(minutes=10 - i),
+            )
+
+    def test_announce_one(self):
+        """without --drain only the oldest is sent"""
+
+        with patch("blogs.http_client.post", return_value=mastodon_response()) as post:
+            call_command("announce")
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args.kwargs["data"]["status"], "announcement 0")
+        self.assertEqual(models.Announcement.objects.count(), 4)
+
+    def test_announce_drain(self):
+        """--drain sends up to --limit, oldest first"""
+
+        with patch("blogs.http_client.post", return_value=mastodon_response()) as post:
+            call_command("announce", "--drain", "--limit", "3")
+
+        self.assertEqual(
+            [call.kwargs["data"]["status"] for call in post.call_args_list],
+            ["announcement 0", "announcement 1", "announcement 2"],
+        )
+        self.assertEqual(models.Announcement.objects.count(), 2)
+
+    def test_announce_drain_rate_limited(self):
+        """draining stops when the rate limit runs low"""
+
+        reset = timezone.now() + timedelta(hours=1)
+        response = mastodon_response(remaining=2, reset=reset)
+
+        with patch("blogs.http_client.post", return_value=response) as post:
+            call_command("announce", "--drain")
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(models.Announcement.objects.count(), 4)
+
+    def test_announce_failure(self):
+        """a failed announcement is released back to the queue"""
+
+        with patch(
+            "blogs.http_client.post", return_value=mastodon_response(status_code=429)
+        ) as post:
+            call_command("announce", "--drain")
+
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(models.Announcement.objects.count(), 5)
+        self.assertFalse(
+            models.Announcement.objects.filter(claimed__isnull=False).exists()
+        )
+
+    def test_claim_next(self):
+        """claimed announcements are skipped until the claim goes stale"""
+
+        first = models.Announcement.claim_next()
+        second = models.Announcement.claim_next()
+
+        self.assertEqual(first.status, "announcement 0")
+        self.assertEqual(second.status, "announcement 1")
+
+        first.claimed = timezone.now() - timedelta(minutes=11)
+        first.save()
+
+        self.assertEqual(models.Announcement.claim_next().id, first.id)
+
+    def test_get_pause(self):
+        """spread the remaining rate limit until it resets"""
+
+        reset = timezone.now() + timedelta(seconds=100)
+
+        self.assertEqual(get_pause(mastodon_response()), 0)
+        self.assertIsNone(get_pause(mastodon_response(status_code=429)))
+        self.assertIsNone(get_pause(mastodon_response(remaining=5, reset=reset)))
+        self.assertAlmostEqual(
+            get_pause(mastodon_response(remaining=10, reset=reset)), 10, delta=1
+        )
+
+        # we'd have to wait too long, so stop and let the next run carry on
+        reset = timezone.now() + timedelta(hours=3)
+        self.assertIsNone(get_pause(mastodon_response(remaining=10, reset=reset)))
+
+
+class WeeklyEmailTestCase(TestCase):
+    """the weekly digest"""
+
+    def setUp(self):
+        """a blog post and a couple of subscribers"""
+
+        blog = models.Blog.objects.create(
+            title="My Blog",
+            url="https://example.com",
+            feed="https://example.com/feed",
+            category="LIB",
+            approved=True,
+        )
+        models.Article.objects.create(
+            title="Cataloguing & <Me>",
+            author_name="Ann Author",
+            url="https://example.com/post",
+            description="<p>All about <strong>cataloguing</strong></p>",
+            blog=blog,
+            pubdate=timezone.now() - timedelta(days=1),
+            updateddate=timezone.now(),
+            guid="post",
+        )
+        self.subscriber = models.Subscriber.objects.create(email="one@example.com")
+        models.Subscriber.objects.filter(pk=self.subscriber.pk).update(confirmed=True)
+        self.subscriber.refresh_from_db()
+        models.Subscriber.objects.create(email="unconfirmed@example.com")
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_weekly_email(self):
+        """confirmed subscribers get html and plain text parts"""
+
+        call_command("send_weekly_email")
+
+        self.assertEqual(len(mail.outbox), 1)
+        msg = mail.outbox[0]
+        self.assertEqual(msg.to, ["one@example.com"])
+        self.assertIn("Fresh Aus GLAMR updates", msg.subject)
+
+        self.assertIn("Cataloguing & <Me>", msg.body)
+        self.assertIn("All about cataloguing", msg.body)
+        self.assertIn(
+            f"/unsubscribe-email/{self.subscriber.token}/{self.subscriber.id}",
+            msg.body,
+        )
+
+        html, mimetype = msg.alternatives[0]
+        self.assertEqual(mimetype, "text/html")
+        self.assertIn("Cataloguing &amp; &lt;Me&gt;", html)
+        self.assertIn("<strong>cataloguing</strong>", html)
+        self.assertIn("<strong>one@example.com</strong>", html)
+        self.assertIn(
+            f"/unsubscribe-email/{self.subscriber.token}/{self.subscriber.id}", html
+        )
+        self.assertNotIn(FOOTER, html)
+
+    def test_digest_without_updates(self):
+        """a quiet week still sends something"""
+
+        models.Blog.objects.all().delete()
+        digest = build_digest()
+        msg = digest.message(self.subscriber)
+
+        self.assertIn("No new updates this week", msg.body)
+        self.assertIn("No new updates this week", msg.alternatives[0][0])
+        self.assertIn("one@example.com", msg.body)
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_weekly_email_resumes(self):
+        """a second run only sends to subscribers the first one missed"""
+
+        second = models.Subscriber.objects.create(email="two@example.com")
+        models.Subscriber.objects.filter(pk=second.pk).update(confirmed=True)
+
+        run = start_run()
+        self.assertEqual(run.deliveries.count(), 2)
+        run.deliveries.get(subscriber=self.subscriber).mark_sent()
+
+        call_command("send_weekly_email")
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["two@example.com"])
+        run.refresh_from_db()
+        self.assertIsNotNone(run.completed)
+
+        # the week's email has gone, running again sends nothing
+        call_command("send_weekly_email")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(models.DigestRun.objects.count(), 1)
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_weekly_email_retries(self):
+        """failed sends are retried after a backoff"""
+
+        connection = Mock()
+        connection.send_messages.side_effect = [smtplib.SMTPServerDisconnected(), 1]
+
+        def wait(seconds):
+            """skip ahead to the retry"""
+            models.DigestDelivery.objects.update(next_attempt_at=timezone.now())
+
+        with patch(
+            "blogs.management.commands.send_weekly_email.get_connection",
+            return_value=connection,
+        ), patch(
+            "blogs.management.commands.send_weekly_email.time.sleep",
+            side_effect=wait,
+        ) as sleep, self.assertLogs(
+            level="INFO"
+        ) as logs:
+            call_command("send_weekly_email")
+
+        self.assertIn("1 sent, 0 failed, 1 retried", logs.output[-1])
+
+        self.assertEqual(connection.send_messages.call_count, 2)
+        self.assertEqual(
+            connection.close.call_count, 2
+        )  # after failing, and at the end
+        sleep.assert_called_once()
+        self.assertLessEqual(sleep.call_args.args[0], 60)
+
+        delivery = models.DigestDelivery.objects.get()
+        self.assertEqual(delivery.status, models.DeliveryStatus.SENT)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertIsNotNone(delivery.run.completed)
+
+    def test_claim_batch(self):
+        """claimed deliveries are not handed to another worker"""
+
+        run = start_run()
+        self.assertEqual(len(models.DigestDelivery.claim_batch(run, 10)), 1)
+        self.assertEqual(models.DigestDelivery.claim_batch(run, 10), [])
+
+        # until the claim goes stale
+        models.DigestDelivery.objects.update(
+            claimed=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(len(models.DigestDelivery.claim_batch(run, 10)), 1)
+
+    def test_mark_failed(self):
+        """the delay doubles with each attempt until we give up"""
+
+        run = start_run()
+        delivery = run.deliveries.get()
+
+        delivery.mark_failed("oops")
+        first = delivery.next_attempt_at - timezone.now()
+        delivery.mark_failed("oops")
+        second = delivery.next_attempt_at - timezone.now()
+
+        self.assertAlmostEqual(second / first, 2, places=1)
+        self.assertEqual(delivery.error, "oops")
+        self.assertTrue(run.outstanding().exists())
+
+        models.DigestDelivery.objects.update(
+            attempts=models.DigestDelivery.max_attempts
+        )
+        self.assertFalse(run.outstanding().exists())
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_weekly_email_gives_up(self):
+        """deliveries that run out of attempts are reported as failed"""
+
+        run = start_run()
+        models.DigestDelivery.objects.update(
+            attempts=models.DigestDelivery.max_attempts - 1
+        )
+
+        connection = Mock()
+        connection.send_messages.side_effect = smtplib.SMTPRecipientsRefused({})
+
+        with patch(
+            "blogs.management.commands.send_weekly_email.get_connection",
+            return_value=connection,
+        ), self.assertLogs(level="INFO") as logs:
+            call_command("send_weekly_email")
+
+        self.assertIn("0 sent, 1 failed, 0 retried", logs.output[-1])
+        run.refresh_from_db()
+        self.assertIsNotNone(run.completed)
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_weekly_email_workers(self):
+        """subscribers are sharded across connections"""
+
+        for i in range(5):
+            subscriber = models.Subscriber.objects.create(email=f"{i}@example.com")
+            models.Subscriber.objects.filter(pk=subscriber.pk).update(confirmed=True)
+
+        connections = [Mock(), Mock()]
+        for connection in connections:
+            connection.send_messages.return_value = 1
+
+        with patch(
+            "blogs.management.commands.send_weekly_email.get_connection",
+            side_effect=connections,
+        ), self.assertLogs(level="INFO") as logs:
+            call_command("send_weekly_email", workers=2)
+
+        for shard, connection in enumerate(connections):
+            recipients = [
+                call.args[0][0].to[0]
+                for call in connection.send_messages.call_args_list
+            ]
+            self.assertEqual(
+                recipients,
+                [
+                    subscriber.email
+                    for subscriber in models.Subscriber.objects.filter(
+                        confirmed=True
+                    ).order_by("id")
+                    if subscriber.id % 2 == shard
+                ],
+            )
+
+        self.assertEqual(
+            models.DigestDelivery.objects.filter(
+                status=models.DeliveryStatus.SENT
+            ).count(),
+            6,
+        )
+        self.assertIn("6 sent, 0 failed, 0 retried with 2 workers", logs.output[-1])
+        self.assertIn("messages/sec", logs.output[-1])
@@ -1,6 +1,6 @@
 """model tests"""
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from datetime import timezone as dt_tz
 
 from django.test import TestCase
@@ -62,6 +62,34 @@ class BlogTestCase(TestCase):
         status = f"My article (Hugh on mya awesome blog)\n\nhttps://example.blog/1"
         self.assertTrue(models.Announcement.objects.filter(status=status).exists())
 
+    def test_article_search_vector(self):
+        """article search vectors follow the title and tags"""
+
+        article = models.Article.objects.create(
+            title="Cataloguing manuscripts",
+            url="https://example.blog/2",
+            blog=self.blog,
+            guid="456-456-456",
+        )
+
+        def found(term):
+            return models.Article.objects.filter(search_vector=term).exists()
+
+        self.assertTrue(found("manuscripts"))
+        self.assertFalse(found("preservation"))
+
+        tag = models.Tag.objects.create(name="preservation")
+        article.tags.add(tag)
+        self.assertTrue(found("preservation"))
+
+        tag.name = "conservation"
+        tag.save()
+        self.assertFalse(found("preservation"))
+        self.assertTrue(found("conservation"))
+
+        article.tags.clear()
+        self.assertFalse(found("conservation"))
+
 
 class ConferenceTestCase(TestCase):
     """test event functions"""
@@ -156,6 +184,120 @@ class NewsletterTestCase(TestCase):
         )
 
 
+class TagTestCase(TestCase):
+    """test cases for Tag model"""
+
+    def test_refresh_usage(self):
+        """tag usage is counted all time and for recent articles"""
+
+        blog = models.Blog.objects.create(
+            title="my awesome blog",
+            url="https://test.com",
+            feed="https://test.com/feed.xml",
+            category="LIB",
+        )
+        popular = models.Tag.objects.create(name="popular")
+        unused = models.Tag.objects.create(name="unused")
+
+        for i, days in enumerate([1, 45, 200]):
+            article = models.Article.objects.create(
+                title=f"Article {i}",
+                url=f"https://test.com/{i}",
+                blog=blog,
+                guid=str(i),
+                pubdate=timezone.now() - timedelta(days=days),
+            )
+            article.tags.add(popular)
+
+        models.Tag.refresh_usage()
+        popular.refresh_from_db()
+        unused.refresh_from_db()
+
+        self.assertEqual(
+            (popular.total, popular.last_90_days, popular.last_30_days), (3, 2, 1)
+        )
+        self.assertEqual(unused.total, 0)
+
+
+class ContentItemTestCase(TestCase):
+    """test the ContentItem index stays in step"""
+
+    def setUp(self):
+        """set up a blog and event"""
+
+        self.blog = models.Blog.objects.create(
+            title="my awesome blog",
+            url="https://test.com",
+            feed="https://test.com/feed.xml",
+            category="LIB",
+        )
+        self.event = models.Event.objects.create(
+            name="Amazing Conf",
+            url="https://amazing.conf",
+            category="MUS",
+            start_date=date(2030, 1, 1),
+        )
+
+    def test_listed_when_approved(self):
+        """unapproved things are not listed"""
+
+        self.assertFalse(models.ContentItem.objects.exists())
+
+        self.blog.approved = True
+        self.blog.save()
+        self.event.approved = True
+        self.event.save()
+
+        item = models.ContentItem.objects.get(kind=models.ContentKind.BLOG)
+        self.assertEqual(item.object_id, self.blog.id)
+        self.assertEqual(item.categories, ["Libraries"])
+        self.assertTrue(
+            models.ContentItem.objects.filter(kind=models.ContentKind.EVENT).exists()
+        )
+
+        # like the admin actions
+        models.Blog.objects.filter(pk=self.blog.pk).update(suspended=True)
+        models.ContentItem.sync(models.Blog.objects.filter(pk=self.blog.pk))
+        self.assertFalse(
+            models.ContentItem.objects.filter(kind=models.ContentKind.BLOG).exists()
+        )
+
+    def test_article_and_cfp(self):
+        """articles list their tags and cfps their event"""
+
+        article = models.Article.objects.create(
+            title="My article",
+            url="https://test.com/1",
+            blog=self.blog,
+            guid="1",
+        )
+        article.tags.add(models.Tag.objects.create(name="cataloguing"))
+
+        item = models.ContentItem.objects.get(kind=models.ContentKind.ARTICLE)
+        self.assertEqual(item.title, "My article")
+        self.assertEqual(item.categories, ["cataloguing"])
+
+        cfp = models.CallForPapers.objects.create(
+            event=self.event,
+            name="Call for papers",
+            opening_date=date(2029, 1, 1),
+            closing_date=date(2029, 2, 1),
+        )
+        item = models.ContentItem.objects.get(kind=models.ContentKind.CFP)
+        self.assertEqual(item.url, "https://amazing.conf")
+        self.assertEqual(item.guid, f"https://amazing.conf-cfp-{cfp.id}")
+
+        self.event.url = "https://amazing.conf/2030"
+        self.event.save()
+        item.refresh_from_db()
+        self.assertEqual(item.url, "https://amazing.conf/2030")
+
+        article.delete()
+        self.assertFalse(
+            models.ContentItem.objects.filter(kind=models.ContentKind.ARTICLE).exists()
+        )
+
+
 class UtilsTestCase(TestCase):
     """test utility functions"""
 
@@ -167,3 +309,79 @@ class UtilsTestCase(TestCase):
         )
 
         self.assertTrue(warning.is_in("I saw a horrible thingy"))
+
+    def test_content_warning_matcher(self):
+        """every warning is found in one pass, including overlapping ones"""
+
+        matcher = models.ContentWarningMatcher(
+            [
+                ("horrible", "bad"),
+                ("horrible thing", "bad shit"),
+                ("ible th", "overlap"),
+                ("spiders", "spiders"),
+                ("", "blank"),
+                (None, "null"),
+                ("spider", None),
+            ]
+        )
+
+        self.assertEqual(
+            matcher.match("I saw a HORRIBLE thingy", None, "more spiders"),
+            ["bad", "bad shit", "overlap", "spiders"],
+        )
+        self.assertEqual(matcher.match("spiders and spiders"), ["spiders"])
+        self.assertEqual(matcher.match("nothing to see"), [])
+        self.assertEqual(
+            models.ContentWarningMatcher([("spiders", None)]).match("spiders"), []
+        )
+        self.assertEqual(models.ContentWarningMatcher([]).match("anything"), [])
+
+    def test_content_warning_matcher_cache(self):
+        """the matcher is rebuilt when warnings change"""
+
+        warning = models.ContentWarning.objects.create(
+            match_text="spiders", display="spiders"
+        )
+        matcher = models.ContentWarning.matcher()
+        self.assertIs(models.ContentWarning.matcher(), matcher)
+        self.assertEqual(matcher.match("spiders"), ["spiders"])
+
+        warning.match_text = "snakes"
+        warning.save()
+        self.assertEqual(models.ContentWarning.matcher().match("spiders"), [])
+
+        warning.delete()
+        self.assertEqual(models.ContentWarning.matcher().match("snakes"), [])
+
+    def test_article_announce_content_warnings(self):
+        """announcements carry a summary of matching warnings"""
+
+        models.ContentWarning.objects.create(match_text="spiders", display="spiders")
+        models.ContentWarning.objects.create(match_text="covid", display="covid")
+        blog = models.Blog.objects.create(
+            title="My Blog",
+            url="https://example.com",
+            feed="https://example.com/feed",
+            category="LIB",
+            approved=True,
+        )
+        article = models.Article.objects.create(
+            title="Spiders in the stacks",
+            url="https://example.com/spiders",
+            blog=blog,
+            pubdate=timezone.now(),
+            updateddate=timezone.now(),
+            guid="spiders",
+        )
+        article.tags.add(models.Tag.objects.create(name="covid"))
+        models.ContentWarning.matcher()
+
+        # tags are looked up once
+        with self.assertNumQueries(2):
+            article.announce()
+        self.assertEqual(models.Announcement.objects.get().summary, "spiders, covid")
+
+        # or not at all if we already have them
+        with self.assertNumQueries(1):
+            article.announce(tag_names=[])
+        self.assertEqual(models.Announcement.objects.last().summary, "spiders")
@@ -0,0 +1,395 @@
+"""query and time budgets for public views"""
+
+from datetime import timedelta
+import time
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blogs import models
+from blogs.pagination import encode_cursor
+
+BLOGS = 200
+ARTICLES = 3000
+TAGS = 100
+TAGS_PER_ARTICLE = 3
+NEWSLETTERS = 50
+EDITIONS = 500
+GROUPS = 100
+EVENTS = 100
+
+# generous, this is to catch a view doing work per row rather than to
+# benchmark it
+TIME_BUDGET = 1.0  # seconds
+
+# query budgets below include the site message every page loads
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class PublicViewBudgetTests(TestCase):
+    """public views cost the same few queries however much content there is"""
+
+    @classmethod
+    def setUpTestData(cls):
+        """seed an archive about the size of the real one"""
+
+        now = timezone.now()
+        categories = [choice for choice, _label in models.Category.choices]
+
+        blogs = models.Blog.objects.bulk_create(
+            models.Blog(
+                title=f"Blog {i}",
+                url=f"https://blog{i}.example",
+                feed=f"https://blog{i}.example/feed",
+                category=categories[i % len(categories)],
+                updateddate=now,
+                approved=True,
+            )
+            for i in range(BLOGS)
+        )
+        tags = models.Tag.objects.bulk_create(
+            models.Tag(name=f"tag {i}") for i in range(TAGS)
+        )
+        articles = models.Article.objects.bulk_create(
+            models.Article(
+                title=f"Article {i} about tag {i % TAGS}",
+                url=f"https://blog{i % BLOGS}.example/{i}",
+                description="A post about cataloguing",
+                blog=blogs[i % BLOGS],
+                updateddate=now - timedelta(hours=i),
+                pubdate=now - timedelta(hours=i),
+                guid=str(i),
+            )
+            for i in range(ARTICLES)
+        )
+        ArticleTag = models.Article.tags.through
+        ArticleTag.objects.bulk_create(
+            ArticleTag(article_id=article.id, tag_id=tags[(i + j) % TAGS].id)
+            for i, article in enumerate(articles)
+            for j in range(TAGS_PER_ARTICLE)
+        )
+
+        newsletters = models.Newsletter.objects.bulk_create(
+            models.Newsletter(
+                name=f"Newsletter {i}",
+                author_name=f"Author {i}",
+                category=categories[i % len(categories)],
+                url=f"https://news{i}.example",
+                updateddate=now,
+                approved=True,
+            )
+            for i in range(NEWSLETTERS)
+        )
+        models.Edition.objects.bulk_create(
+            models.Edition(
+                title=f"Edition {i}",
+                url=f"https://news{i % NEWSLETTERS}.example/{i}",
+                newsletter=newsletters[i % NEWSLETTERS],
+                updateddate=now - timedelta(days=i),
+                pubdate=now - timedelta(days=i),
+                guid=str(i),
+            )
+            for i in range(EDITIONS)
+        )
+
+        models.Group.objects.bulk_create(
+            models.Group(
+                name=f"Group {i}",
+                category=categories[i % len(categories)],
+                type="EML",
+                url=f"https://group{i}.example",
+                registration_url=f"https://group{i}.example/join",
+                approved=True,
+            )
+            for i in range(GROUPS)
+        )
+
+        events = models.Event.objects.bulk_create(
+            models.Event(
+                name=f"Conference {i}",
+                category=categories[i % len(categories)],
+                url=f"https://conf{i}.example",
+                pubdate=now,
+                start_date=(now + timedelta(days=i + 1)).date(),
+                approved=True,
+            )
+            for i in range(EVENTS)
+        )
+        models.CallForPapers.objects.bulk_create(
+            models.CallForPapers(
+                event=event,
+                name=f"Call for papers {i}",
+                opening_date=(now - timedelta(days=1)).date(),
+                closing_date=(now + timedelta(days=i + 1)).date(),
+                approved=True,
+            )
+            for i, event in enumerate(events)
+        )
+
+        # bulk_create skips the hooks that maintain these
+        for model in [
+            models.Article,
+            models.Edition,
+            models.Newsletter,
+            models.Group,
+            models.Event,
+            models.CallForPapers,
+        ]:
+            model.update_search_vectors()
+        models.ContentItem.rebuild()
+        models.Tag.refresh_usage()
+
+        # production tables have planner statistics, fresh test tables don't
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertWithinBudget(self, url, max_queries, max_seconds=TIME_BUDGET):
+        """GET a url and check what it cost"""
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries),
+            max_queries,
+            "\n".join(query["sql"] for query in queries.captured_queries),
+        )
+        self.assertLess(elapsed, max_seconds)
+
+    def test_home(self):
+        """home page"""
+        self.assertWithinBudget(reverse("home"), 1)
+
+    def test_blogs(self):
+        """list of blogs"""
+        self.assertWithinBudget(reverse("blogs"), 2)
+        self.assertWithinBudget(reverse("blog-category ", args=["LIB"]), 2)
+
+    def test_articles(self):
+        """latest articles with their blog and tags"""
+        self.assertWithinBudget(reverse("blog-articles"), 3)
+
+        # a page deep in the archive costs the same as the first
+        article = models.Article.objects.order_by("pubdate", "id").first()
+        cursor = encode_cursor(article)
+        self.assertWithinBudget(f"{reverse('blog-articles')}?before={cursor}", 3)
+
+    def test_events(self):
+        """upcoming events with their soonest open call for papers"""
+        self.assertWithinBudget(reverse("events"), 3)
+        self.assertWithinBudget(reverse("events-category", args=["LIB"]), 3)
+
+    def test_cfps(self):
+        """open calls for papers with their event"""
+        self.assertWithinBudget(reverse("cfps"), 2)
+
+    def test_groups(self):
+        """list of groups"""
+        self.assertWithinBudget(reverse("groups"), 2)
+
+    def test_newsletters(self):
+        """list of newsletters"""
+        self.assertWithinBudget(reverse("newsletters"), 2)
+
+    def test_editions(self):
+        """latest editions with their newsletter"""
+        self.assertWithinBudget(reverse("newsletter-editions"), 2)
+
+    def test_browse(self):
+        """articles for a tag, with trending tags"""
+        self.assertWithinBudget(f"{reverse('browse')}?q=tag+1", 4)
+
+    def test_search(self):
+        """a search matching thousands of articles"""
+        self.assertWithinBudget(f"{reverse('search')}?q=cataloguing", 5)
+        self.assertWithinBudget(f"{reverse('search')}?q=cataloguing&page=50", 5)
+
+    def test_feeds(self):
+        """each Atom feed"""
+
+        for name, queries in [
+            ("feed", 1),
+            ("article-feed", 2),
+            ("edition-feed", 1),
+            ("event-feed", 1),
+        ]:
+            with self.subTest(feed=name):
+                self.assertWithinBudget(reverse(name), queries)
+
+
+class IndexUsageTests(TestCase):
+    """the main queries can be answered from their indexes
+
+    sequential scans are disabled to make postgres show which index it would
+    use. Where indexes overlap the choice depends on row estimates, so the
+    tables those queries read get enough rows for realistic statistics
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """spread blogs across categories and calls for papers across events"""
+
+        now = timezone.now()
+        categories = [choice for choice, _label in models.Category.choices]
+
+        models.Blog.objects.bulk_create(
+            models.Blog(
+                title=f"Blog {i}",
+                url=f"https://blog{i}.example",
+                feed=f"https://blog{i}.example/feed",
+                category=categories[i % len(categories)],
+                updateddate=now - timedelta(hours=i),
+                approved=True,
+            )
+            for i in range(BLOGS * 5)
+        )
+        events = models.Event.objects.bulk_create(
+            models.Event(
+                name=f"Conference {i}",
+                category=categories[i % len(categories)],
+                url=f"https://conf{i}.example",
+                pubdate=now,
+                start_date=(now + timedelta(days=i)).date(),
+                approved=True,
+            )
+            for i in range(EVENTS)
+        )
+        models.CallForPapers.objects.bulk_create(
+            models.CallForPapers(
+                event=event,
+                name=f"Call for papers {i}",
+                opening_date=(now - timedelta(days=60)).date(),
+                closing_date=(now + timedelta(days=j * 30 - 150)).date(),
+                approved=True,
+            )
+            for i, event in enumerate(events)
+            for j in range(10)
+        )
+
+    def setUp(self):
+        """only consider index scans, with statistics for this data
+
+        row estimates from an earlier ANALYZE outlive that test's rollback,
+        so analyze again to stop them leaking in here
+        """
+
+        tables = [
+            model._meta.db_table
+            for model in [
+                models.Article,
+                models.Edition,
+                models.Blog,
+                models.Newsletter,
+                models.Event,
+                models.CallForPapers,
+                models.Group,
+                models.Subscriber,
+                models.FeedFetch,
+                models.ContentItem,
+                models.Tag,
+            ]
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {', '.join(tables)}")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index):
+        """EXPLAIN a queryset and check the plan uses an index"""
+
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_indexes(self):
+        """each view and command query uses the index made for it"""
+
+        now = timezone.now()
+        pubdate = now - timedelta(days=7)
+        due = Q(next_check_at__isnull=True) | Q(next_check_at__lte=now)
+
+        for queryset, index in [
+            (
+                models.Article.objects.order_by("-pubdate", "-id")[:11],
+                "article_pubdate_id_idx",
+            ),
+            (
+                models.Article.objects.filter(pubdate__lte=pubdate)
+                .exclude(pubdate=pubdate, id__gte=100)
+                .order_by("-pubdate", "-id")[:11],
+                "article_pubdate_id_idx",
+            ),
+            (
+                models.Edition.objects.order_by("-pubdate", "-id")[:11],
+                "edition_pubdate_id_idx",
+            ),
+            (
+                models.Blog.objects.filter(approved=True, active=True).order_by(
+                    "-updateddate"
+                ),
+                "blog_listed_updated_idx",
+            ),
+            (
+                models.Blog.objects.filter(
+                    approved=True, active=True, category="LIB"
+                ).order_by("-updateddate"),
+                "blog_listed_idx",
+            ),
+            (
+                models.Blog.objects.filter(
+                    due, approved=True, suspended=False, active=True
+                ),
+                "blog_due_idx",
+            ),
+            (
+                models.Newsletter.objects.filter(
+                    due, approved=True, active=True, feed__isnull=False
+                ),
+                "newsletter_due_idx",
+            ),
+            (
+                models.Newsletter.objects.filter(approved=True).order_by("name"),
+                "newsletter_listed_idx",
+            ),
+            (
+                models.Event.objects.filter(
+                    approved=True, start_date__gte=now
+                ).order_by("start_date"),
+                "event_upcoming_idx",
+            ),
+            (
+                models.CallForPapers.objects.filter(
+                    approved=True, closing_date__gte=now
+                ).order_by("closing_date"),
+                "cfp_open_idx",
+            ),
+            (
+                models.Group.objects.filter(approved=True).order_by("name"),
+                "group_listed_idx",
+            ),
+            (
+                models.Subscriber.objects.filter(confirmed=True),
+                "subscriber_confirmed_idx",
+            ),
+            (
+                models.FeedFetch.objects.filter(fetched__lt=now),
+                "feedfetch_fetched_idx",
+            ),
+            (
+                models.ContentItem.objects.order_by("-pubdate")[:30],
+                "content_item_pubdate_idx",
+            ),
+            (
+                models.Tag.objects.order_by("-total")[:10],
+                "tag_total_idx",
+            ),
+        ]:
+            with self.subTest(index=index):
+                self.assertUsesIndex(queryset, index)
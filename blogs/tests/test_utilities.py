@@ -1,11 +1,15 @@
 """test utility functions"""
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pathlib
+import threading
+import time
 
-from django.test import TestCase
-from unittest.mock import patch
+from django.core import mail
+from django.test import TestCase, override_settings
+from unittest.mock import MagicMock, Mock, patch
 
-from blogs import models, utilities
+from blogs import fetcher, http_client, models, utilities
 
 
 class FeedParserFeedMock(object):
@@ -39,6 +43,37 @@ class RequestsMock(object):
         self.raise_for_status = raise_for_status
 
 
+class StreamingResponseMock(object):
+    status_code = 200
+
+    def __init__(self, chunks, headers=None):
+        self.chunks = chunks
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        return None
+
+    @property
+    def raw(self):
+        return RawResponseMock(self.chunks)
+
+
+class RawResponseMock(object):
+    connection = None
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def read1(self, amt, decode_content=False):
+        return next(self.chunks, b"")
+
+
 class UtilityTests(TestCase):
     """utility test cases"""
 
@@ -57,13 +92,18 @@ class UtilityTests(TestCase):
 
         self.feedparser = FeedParserMock(feed=feed)
         self.feedparser_partial = FeedParserMock(feed=feed_partial)
+        self.response = (200, {}, b"<rss></rss>")
 
     def test_get_feed_info(self):
         """test get feed info"""
 
-        with patch("feedparser.parse", return_value=self.feedparser):
+        with patch("feedparser.parse", return_value=self.feedparser), patch(
+            "blogs.fetcher.download", return_value=self.response
+        ) as download:
             data = utilities.get_feed_info("https://test.test")
 
+            download.assert_called_once_with("https://test.test")
+
             self.assertEqual(data["feed"], "https://test.test")
             self.assertEqual(data["title"], "My amazing blog")
             self.assertEqual(data["author_name"], "Hugh Rundle")
@@ -80,8 +120,8 @@ class UtilityTests(TestCase):
             website = RequestsMock(text=webfile, raise_for_status=request_error)
 
             with patch("feedparser.parse", return_value=self.feedparser), patch(
-                "requests.get", return_value=website
-            ):
+                "blogs.http_client.get", return_value=website
+            ), patch("blogs.fetcher.download", return_value=self.response):
                 data = utilities.get_blog_info("http://test.test")
 
                 self.assertEqual(data, False)
@@ -97,8 +137,8 @@ class UtilityTests(TestCase):
             website = RequestsMock(text=webfile, raise_for_status=request_error)
 
             with patch("feedparser.parse", return_value=self.feedparser), patch(
-                "requests.get", return_value=website
-            ):
+                "blogs.http_client.get", return_value=website
+            ), patch("blogs.fetcher.download", return_value=self.response):
                 data = utilities.get_blog_info("http://test.test")
 
                 self.assertEqual(
@@ -122,8 +162,8 @@ class UtilityTests(TestCase):
             website = RequestsMock(text=webfile, raise_for_status=request_error)
 
             with patch("feedparser.parse", return_value=self.feedparser_partial), patch(
-                "requests.get", return_value=website
-            ):
+                "blogs.http_client.get", return_value=website
+            ), patch("blogs.fetcher.download", return_value=self.response):
                 data = utilities.get_blog_info("http://test.test")
 
                 self.assertEqual(
@@ -147,8 +187,8 @@ class UtilityTests(TestCase):
             website = RequestsMock(text=webfile, raise_for_status=request_error)
 
             with patch("feedparser.parse", return_value=self.feedparser), patch(
-                "requests.get", return_value=website
-            ):
+                "blogs.http_client.get", return_value=website
+            ), patch("blogs.fetcher.download", return_value=self.response):
                 data = utilities.get_blog_info("http://test.test")
 
                 self.assertEqual(data["title"], "My test website with an RSS feed")
@@ -166,8 +206,8 @@ class UtilityTests(TestCase):
             website = RequestsMock(text=webfile, raise_for_status=request_error)
 
             with patch("feedparser.parse", return_value=self.feedparser_partial), patch(
-                "requests.get", return_value=website
-            ):
+                "blogs.http_client.get", return_value=website
+            ), patch("blogs.fetcher.download", return_value=self.response):
                 data = utilities.get_blog_info("http://test.test")
 
                 self.assertEqual(data["title"], "My test website with an RSS feed")
@@ -179,3 +219,227 @@ class UtilityTests(TestCase):
 
         # TODO
         pass
+
+
+class SendMessagesTests(TestCase):
+    """bulk email"""
+
+    def setUp(self):
+        """some messages to send"""
+
+        self.messages = [
+            utilities.make_email("Hello", "<p>Hello</p>", f"person{i}@example.com")
+            for i in range(5)
+        ]
+
+    @override_settings(EMAIL_BATCH_SIZE=2, EMAIL_BATCH_PAUSE=3)
+    def test_send_messages_in_batches(self):
+        """one connection, batches of EMAIL_BATCH_SIZE with a pause between"""
+
+        connection = MagicMock()
+        connection.send_messages.side_effect = len
+
+        with patch("blogs.utilities.time.sleep") as sleep:
+            sent = utilities.send_messages(iter(self.messages), connection)
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(connection.__enter__.call_count, 1)
+        self.assertEqual(
+            [len(call.args[0]) for call in connection.send_messages.call_args_list],
+            [2, 2, 1],
+        )
+        self.assertEqual(sleep.call_count, 2)
+        sleep.assert_called_with(3)
+
+    @override_settings(EMAIL_BATCH_PAUSE=0)
+    def test_send_messages_outbox(self):
+        """messages are delivered as html"""
+
+        self.assertEqual(utilities.send_messages(self.messages), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].content_subtype, "html")
+        self.assertEqual(mail.outbox[4].to, ["person4@example.com"])
+
+    def test_send_no_messages(self):
+        """nothing to send, so don't connect"""
+
+        with patch("blogs.utilities.get_connection") as get_connection:
+            self.assertEqual(utilities.send_messages([]), 0)
+
+        get_connection.assert_not_called()
+
+
+class FetcherTests(TestCase):
+    """feed fetcher test cases"""
+
+    def test_interleave_hosts(self):
+        """feeds on the same host are spread out"""
+
+        sources = [
+            models.Blog(feed="https://one.test/a"),
+            models.Blog(feed="https://one.test/b"),
+            models.Blog(feed="https://one.test/c"),
+            models.Blog(feed="https://two.test/a"),
+            models.Blog(feed="https://three.test/a"),
+        ]
+
+        ordered = [source.feed for source in fetcher.interleave_hosts(sources)]
+
+        self.assertEqual(
+            ordered,
+            [
+                "https://one.test/a",
+                "https://two.test/a",
+                "https://three.test/a",
+                "https://one.test/b",
+                "https://one.test/c",
+            ],
+        )
+
+    def test_fetch_feeds_per_host_limit(self):
+        """no more than per_host downloads run against one host at once"""
+
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        def download(url, headers=None):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.02)
+            with lock:
+                running["now"] -= 1
+            return 200, {}, b""
+
+        sources = [models.Blog(feed=f"https://one.test/{i}") for i in range(6)]
+
+        with patch("blogs.fetcher.download", side_effect=download):
+            results = list(fetcher.fetch_feeds(sources, workers=6, per_host=2))
+
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(running["max"], 2)
+
+    @override_settings(FEED_MAX_BYTES=20)
+    def test_download(self):
+        """a feed is streamed into memory"""
+
+        response = StreamingResponseMock([b"<rss>", b"</rss>"])
+
+        with patch("blogs.http_client.feed_get", return_value=response) as get:
+            status, headers, content = fetcher.download("https://one.test/feed")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(content, b"<rss></rss>")
+        self.assertTrue(get.call_args.kwargs["stream"])
+
+    @override_settings(FEED_MAX_BYTES=10)
+    def test_download_too_large(self):
+        """a feed that is too big is abandoned"""
+
+        declared = StreamingResponseMock([b""], headers={"content-length": "11"})
+        streamed = StreamingResponseMock([b"<rss>", b"<item>", b"</rss>"])
+
+        for response in [declared, streamed]:
+            with patch("blogs.http_client.feed_get", return_value=response):
+                with self.assertRaises(fetcher.FeedTooLarge):
+                    fetcher.download("https://one.test/feed")
+
+    @override_settings(FEED_TIMEOUT=0)
+    def test_download_too_slow(self):
+        """a feed that takes too long is abandoned"""
+
+        response = StreamingResponseMock([b"<rss>", b"</rss>"])
+
+        with patch("blogs.http_client.feed_get", return_value=response):
+            with self.assertRaises(fetcher.FeedTooSlow):
+                fetcher.download("https://one.test/feed")
+
+
+class TrickleHandler(BaseHTTPRequestHandler):
+    """serves a feed one byte at a time"""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("content-length", "20")
+        self.end_headers()
+        try:
+            for _ in range(20):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.5)
+        except OSError:
+            pass  # the client gave up
+
+    def log_message(self, *args):
+        pass
+
+
+class TrickleTests(TestCase):
+    """downloads from a real, very slow, server"""
+
+    def setUp(self):
+        """start the server"""
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), TrickleHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    @override_settings(FEED_TIMEOUT=1)
+    def test_download_trickle(self):
+        """a feed that trickles in is abandoned at the deadline"""
+
+        start = time.monotonic()
+        with self.assertRaises(fetcher.FeedTooSlow):
+            fetcher.download(f"http://127.0.0.1:{self.server.server_port}/feed")
+
+        self.assertLess(time.monotonic() - start, 2)
+
+
+class HttpClientTests(TestCase):
+    """shared HTTP session test cases"""
+
+    def test_get_uses_shared_session(self):
+        """requests go through the shared session with a timeout"""
+
+        with patch.object(http_client.session, "get") as get:
+            http_client.get("https://one.test")
+            http_client.get("https://one.test", timeout=(31, 31))
+
+        get.assert_any_call("https://one.test", timeout=http_client.timeout)
+        get.assert_any_call("https://one.test", timeout=(31, 31))
+
+    def test_post_uses_shared_session(self):
+        """posts go through the shared session with a timeout"""
+
+        with patch.object(http_client.session, "post") as post:
+            http_client.post("https://one.test", data={"a": 1})
+
+        post.assert_called_once_with(
+            "https://one.test", data={"a": 1}, timeout=http_client.timeout
+        )
+
+    def test_pooled_adapter(self):
+        """every host shares one pooling adapter that retries"""
+
+        adapter = http_client.session.get_adapter("https://one.test")
+
+        self.assertIs(adapter, http_client.session.get_adapter("http://two.test"))
+        self.assertEqual(adapter.max_retries.connect, 2)
+        self.assertFalse(adapter.max_retries.is_retry("POST", 503))
+        self.assertTrue(adapter.max_retries.is_retry("GET", 503))
+        self.assertLessEqual(
+            adapter.max_retries.get_retry_after(Mock(headers={"Retry-After": "3600"})),
+            http_client.MAX_RETRY_AFTER,
+        )
+
+    def test_feed_session(self):
+        """feed downloads don't wait on overloaded servers"""
+
+        adapter = http_client.feed_session.get_adapter("https://one.test")
+
+        self.assertIsNot(adapter, http_client.session.get_adapter("https://one.test"))
+        self.assertEqual(adapter.max_retries.connect, 2)
+        self.assertFalse(adapter.max_retries.is_retry("GET", 503, has_retry_after=True))
+        self.assertFalse(adapter.max_retries.respect_retry_after_header)
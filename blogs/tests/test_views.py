@@ -4,14 +4,16 @@ from datetime import timedelta
 
 from unittest.mock import patch
 
-from django.contrib.auth.models import AnonymousUser
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
 from django.core import mail
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.test.client import RequestFactory
 from django.urls import reverse
 from django.utils import timezone
 
 from blogs import forms, models, views
+from blogs.utilities import invalidate_feeds
 
 
 class PublicTests(TestCase):
@@ -96,6 +98,138 @@ class PublicTests(TestCase):
         cf = self.client.get(reverse("event-feed"))
         self.assertEqual(cf.status_code, 200)
 
+    def test_combined_feed(self):
+        """the combined feed reads the latest of everything from the index"""
+
+        self.glam_conf.approved = True
+        self.glam_conf.save()
+
+        blog = models.Blog.objects.create(
+            title="My blog",
+            url="https://example.blog",
+            feed="https://example.blog/feed",
+            category="LIB",
+            approved=True,
+        )
+        models.Article.objects.create(
+            title="My post",
+            url="https://example.blog/1",
+            blog=blog,
+            guid="1",
+        )
+
+        response = self.client.get(reverse("feed"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Awesome conf")
+        self.assertContains(response, "My blog")
+        self.assertContains(response, "My post")
+
+        response = self.client.get(reverse("event-feed"))
+        self.assertContains(response, "Awesome conf")
+        self.assertNotContains(response, "My post")
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    )
+    def test_feed_queries(self):
+        """rendering a feed takes the same few queries however many items"""
+
+        blog = models.Blog.objects.create(
+            title="My blog",
+            url="https://example.blog",
+            feed="https://example.blog/feed",
+            category="LIB",
+            approved=True,
+        )
+        newsletter = models.Newsletter.objects.create(
+            name="My newsletter",
+            author_name="Someone",
+            category="ARC",
+            url="https://example.news",
+            approved=True,
+        )
+        tags = [models.Tag.objects.create(name=f"tag {i}") for i in range(3)]
+
+        for i in range(10):
+            article = models.Article.objects.create(
+                title=f"Post {i}",
+                url=f"https://example.blog/{i}",
+                blog=blog,
+                guid=str(i),
+            )
+            article.tags.set(tags)
+
+            models.Edition.objects.create(
+                title=f"Edition {i}",
+                url=f"https://example.news/{i}",
+                newsletter=newsletter,
+                guid=str(i),
+                updateddate=timezone.now(),
+            )
+
+            event = models.Event.objects.create(
+                name=f"Conf {i}",
+                url=f"https://conf.conf/{i}",
+                category="GLAM",
+                start_date=timezone.now(),
+                approved=True,
+            )
+            models.CallForPapers.objects.create(
+                event=event,
+                name="Call for papers",
+                opening_date=timezone.now(),
+                closing_date=timezone.now(),
+            )
+
+        for name, queries in [
+            ("article-feed", 2),  # articles and their tags
+            ("edition-feed", 1),  # editions joined to newsletters
+            ("event-feed", 1),
+            ("feed", 1),
+        ]:
+            with self.subTest(feed=name), self.assertNumQueries(queries):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+    def test_feed_cache(self):
+        """feeds are cached until invalidated and support conditional GET"""
+
+        self.glam_conf.approved = True
+        self.glam_conf.save()
+        invalidate_feeds()
+
+        response = self.client.get(reverse("event-feed"))
+        self.assertContains(response, "Awesome conf")
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get(reverse("event-feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            reverse("event-feed"), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+        models.Event.objects.create(
+            name="Another conf",
+            url="https://another.conf",
+            category="GLAM",
+            start_date=timezone.now(),
+            approved=True,
+        )
+
+        # still cached
+        response = self.client.get(reverse("event-feed"))
+        self.assertNotContains(response, "Another conf")
+
+        invalidate_feeds()
+
+        response = self.client.get(reverse("event-feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Another conf")
+
     def test_confirm_register_blog(self):
         """post final event registration form"""
 
@@ -237,11 +371,190 @@ class PublicTests(TestCase):
     def test_search(self):
         """post search query"""
 
-        # TODO
-        pass
+        self.glam_conf.approved = True
+        self.glam_conf.save()
+
+        models.Event.objects.create(
+            name="Unapproved conf",
+            url="https://unapproved.conf",
+            category="GLAM",
+            description="An awesome conf nobody approved",
+            start_date=timezone.now() + timedelta(days=5),
+        )
+
+        response = self.client.get(reverse("search"), {"q": "awesome"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item.name for item in response.context["items"]], ["Awesome conf"]
+        )
+
+        response = self.client.get(reverse("search"), {"q": "nothing"})
+        self.assertEqual(len(response.context["items"]), 0)
+
+    def test_search_pages(self):
+        """search results are merged and paged in the database"""
+
+        self.glam_conf.approved = True
+        self.glam_conf.save()
+
+        models.CallForPapers.objects.create(
+            event=self.glam_conf,
+            name="Awesome call for papers",
+            opening_date=timezone.now(),
+            closing_date=timezone.now() + timedelta(days=1),
+            approved=True,
+        )
+
+        blog = models.Blog.objects.create(
+            title="My blog",
+            url="https://example.blog",
+            feed="https://example.blog/feed",
+            category="LIB",
+        )
+        for i in range(12):
+            models.Article.objects.create(
+                title=f"Awesome post {i}",
+                url=f"https://example.blog/{i}",
+                blog=blog,
+                guid=str(i),
+            )
+
+        response = self.client.get(reverse("search"), {"q": "awesome"})
+        items = response.context["items"]
+        self.assertEqual(items.paginator.count, 14)
+        self.assertEqual(len(items), 10)
+
+        # the event name has the highest weight
+        self.assertEqual(items[0].name, "Awesome conf")
+
+        response = self.client.get(reverse("search"), {"q": "awesome", "page": 2})
+        items = response.context["items"]
+        self.assertEqual(len(items), 4)
+
+        cfp = next(item for item in items if hasattr(item, "event"))
+        self.assertEqual(cfp.name, "Awesome call for papers")
+        self.assertEqual(cfp.category_name, "GLAMR")
+
+    def test_events(self):
+        """each event shows its soonest open call for papers"""
+
+        self.glam_conf.approved = True
+        self.glam_conf.save()
+
+        today = timezone.now().date()
+        for name, days in [("Closed", -1), ("Later", 20), ("Soonest", 10)]:
+            models.CallForPapers.objects.create(
+                event=self.glam_conf,
+                name=name,
+                opening_date=today - timedelta(days=30),
+                closing_date=today + timedelta(days=days),
+            )
+
+        response = self.client.get(reverse("events"))
+        con = response.context["cons"][0]
+        self.assertEqual(con.call_for_papers.name, "Soonest")
+
+    def test_article_pages(self):
+        """articles are paged by cursor, newest first"""
+
+        blog = models.Blog.objects.create(
+            title="My blog",
+            url="https://example.blog",
+            feed="https://example.blog/feed",
+            category="LIB",
+        )
+        pubdate = timezone.now()
+        for i in range(25):
+            models.Article.objects.create(
+                title=f"Post {i}",
+                url=f"https://example.blog/{i}",
+                blog=blog,
+                guid=str(i),
+                # several posts share a pubdate, so ties must be broken by id
+                pubdate=pubdate - timedelta(hours=i // 3),
+            )
+
+        pages = []
+        params = {}
+        while True:
+            page = self.client.get(reverse("blog-articles"), params).context["latest"]
+            pages.append([post.title for post in page])
+            if not page.next_cursor:
+                break
+            params = {"after": page.next_cursor}
+
+        self.assertEqual([len(titles) for titles in pages], [10, 10, 5])
+        titles = [title for titles in pages for title in titles]
+        self.assertEqual(len(set(titles)), 25)
+
+        # and back again
+        page = self.client.get(
+            reverse("blog-articles"), {"before": page.previous_cursor}
+        ).context["latest"]
+        self.assertEqual([post.title for post in page], pages[1])
+
+        # a bad cursor is the first page
+        page = self.client.get(reverse("blog-articles"), {"after": "nonsense"})
+        self.assertEqual([post.title for post in page.context["latest"]], pages[0])
 
     def test_browse(self):
         """post browse tags query"""
 
-        # TODO
-        pass
+        for name, total in [("rare", 1), ("common", 30), ("usual", 10)]:
+            models.Tag.objects.create(name=name, total=total)
+
+        response = self.client.get(reverse("browse"), {"q": "common"})
+        self.assertEqual(
+            [tag.name for tag in response.context["trending"]],
+            ["common", "usual", "rare"],
+        )
+
+
+class AdminTests(TestCase):
+    """admin views"""
+
+    def setUp(self):
+        """log in as an admin"""
+
+        user = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(user)
+
+        blog = models.Blog.objects.create(
+            title="My blog",
+            url="https://example.blog",
+            feed="https://example.blog/feed",
+            category="LIB",
+            approved=True,
+        )
+        self.article = models.Article.objects.create(
+            title="Buy spam now",
+            url="https://example.blog/spam",
+            blog=blog,
+            pubdate=timezone.now(),
+            updateddate=timezone.now(),
+            guid="spam",
+        )
+
+    def test_delete_invalidates_feeds(self):
+        """deleting spam in the admin takes it out of cached feeds"""
+
+        self.assertContains(self.client.get(reverse("feed")), "Buy spam now")
+
+        response = self.client.post(
+            reverse("admin:blogs_article_delete", args=[self.article.id]),
+            {"post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+
+        self.assertNotContains(self.client.get(reverse("feed")), "Buy spam now")
+
+    def test_edit_invalidates_feeds(self):
+        """edits in the admin show up in cached feeds"""
+
+        self.assertContains(self.client.get(reverse("article-feed")), "Buy spam now")
+
+        with patch("blogs.admin.utilities.invalidate_feeds") as invalidate:
+            admin.site._registry[models.Article].save_model(
+                None, self.article, None, True
+            )
+        invalidate.assert_called_once()
@@ -1,23 +1,37 @@
 """useful functions that are not associated with models or views"""
 
+from itertools import islice
+import logging
 import re
+import time
 
 from bs4 import BeautifulSoup
 import feedparser
 import requests
 
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.utils.encoding import iri_to_uri
 
-headers = {"user-agent": "Aus-GLAM-Blogs/0.0.1"}
-timeout = (4, 13)
+from blogs import fetcher, http_client
+
+# cached feeds are keyed on this, so changing it invalidates all of them
+FEED_CACHE_GENERATION = "feeds:generation"
 
 
 def get_feed_info(feed):
     """parse a feed for basic blog info"""
 
-    b = feedparser.parse(feed)
+    try:
+        _, headers, content = fetcher.download(feed)
+    except (requests.RequestException, fetcher.FetchError) as e:
+        logging.warning(f"could not download feed {feed}: {e}")
+        headers, content = {}, b""
+
+    response_headers = {"content-location": feed}
+    response_headers.update({key.lower(): value for key, value in headers.items()})
+    b = feedparser.parse(content, response_headers=response_headers)
     blog = {}
     blog["feed"] = feed
     blog["title"] = getattr(b.feed, "title", "")
@@ -34,7 +48,7 @@ def get_blog_info(url):
     including the feed URL"""
 
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
+        r = http_client.get(url)
         r.raise_for_status()
 
         soup = BeautifulSoup(r.text, "html.parser")
@@ -81,7 +95,7 @@ def get_blog_info(url):
 
     except requests.Timeout:
         logging.warning(f"TIMEOUT error registering {url}, trying longer timeout")
-        r = requests.get(url, headers=headers, timeout=(31, 31))
+        r = http_client.get(url, timeout=(31, 31))
         r.raise_for_status()  # let it flow through, a timeout here means the site is unreasonably slow
 
     except Exception as e:
@@ -102,12 +116,12 @@ def get_webfinger_subscribe_uri(username):
             f"https://{domain}/.well-known/webfinger/?resource=acct:{username}"
         )
 
-        r = requests.get(webfinger_url, headers=headers, timeout=timeout)
+        r = http_client.get(webfinger_url)
         r.raise_for_status()
 
     except requests.Timeout:
         logging.warning(f"TIMEOUT error finding {username}, trying longer timeout")
-        r = requests.get(webfinger_url, headers=headers, timeout=(31, 31))
+        r = http_client.get(webfinger_url, timeout=(31, 31))
         r.raise_for_status()  # let it flow through, a timeout here means the site is unreasonably slow
 
     except Exception as e:
@@ -134,14 +148,62 @@ def get_webfinger_subscribe_uri(username):
     return None
 
 
-def send_email(subject, message, recipient):
-    """send an email"""
+def make_email(subject, message, recipient, connection=None):
+    """an html email, ready to send"""
 
     msg = EmailMessage(
         subject,
         message,
         settings.DEFAULT_FROM_EMAIL,
         [recipient],
+        connection=connection,
     )
     msg.content_subtype = "html"
-    msg.send()
+    return msg
+
+
+def send_email(subject, message, recipient):
+    """send an email"""
+
+    make_email(subject, message, recipient).send()
+
+
+def send_messages(messages, connection=None):
+    """send emails in batches over a single connection
+
+    pauses for EMAIL_BATCH_PAUSE seconds between batches of EMAIL_BATCH_SIZE
+    to stay under the provider's limits. Returns how many were sent
+    """
+
+    messages = iter(messages)
+    batch_size = max(settings.EMAIL_BATCH_SIZE, 1)
+    batch = list(islice(messages, batch_size))
+    if not batch:
+        return 0  # don't bother connecting
+
+    connection = connection or get_connection()
+    sent = 0
+
+    with connection:
+        while batch:
+            sent += connection.send_messages(batch) or 0
+            batch = list(islice(messages, batch_size))
+            if batch and settings.EMAIL_BATCH_PAUSE:
+                time.sleep(settings.EMAIL_BATCH_PAUSE)
+
+    return sent
+
+
+def get_feed_cache_generation():
+    """the current generation of cached feeds"""
+
+    return cache.get_or_set(FEED_CACHE_GENERATION, time.time_ns, timeout=None)
+
+
+def invalidate_feeds():
+    """make every cached Atom feed stale
+
+    old entries are not deleted, they just expire unused
+    """
+
+    cache.set(FEED_CACHE_GENERATION, time.time_ns(), timeout=None)
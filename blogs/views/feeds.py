@@ -1,20 +1,66 @@
 """rss feeds"""
 
-from itertools import chain
-from operator import attrgetter
+import hashlib
+import time
 
 from django.conf import settings
 
 from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
 from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 
 
 from blogs import models
+from blogs.utilities import get_feed_cache_generation
 
 # pylint: disable=R6301
 
 
-class ArticleFeed(Feed):
+class CachedFeed(Feed):
+    """A feed that is rendered once and then served from the cache
+
+    the cache is invalidated by utilities.invalidate_feeds() when there is
+    something new to show, and clients can make conditional requests
+    """
+
+    def __call__(self, request, *args, **kwargs):
+        key = ":".join(
+            [
+                "feed",
+                type(self).__name__,
+                request.get_host(),
+                str(get_feed_cache_generation()),
+            ]
+        )
+        cached = cache.get(key)
+
+        if cached is None:
+            response = super().__call__(request, *args, **kwargs)
+            cached = {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "etag": quote_etag(hashlib.sha256(response.content).hexdigest()),
+                "last_modified": parse_http_date_safe(response.get("Last-Modified"))
+                or int(time.time()),
+            }
+            cache.set(key, cached, settings.FEED_CACHE_TIMEOUT)
+
+        response = HttpResponse(cached["content"], content_type=cached["content_type"])
+        response["ETag"] = cached["etag"]
+        response["Last-Modified"] = http_date(cached["last_modified"])
+
+        return get_conditional_response(
+            request,
+            etag=cached["etag"],
+            last_modified=cached["last_modified"],
+            response=response,
+        )
+
+
+class ArticleFeed(CachedFeed):
     """Combined RSS feed for all the articles"""
 
     feed_type = Atom1Feed
@@ -27,7 +73,8 @@ class ArticleFeed(Feed):
 
     def items(self):
         """each article in the feed"""
-        return models.Article.objects.order_by("-pubdate")[:20]
+        articles = models.Article.objects.prefetch_related("tags")
+        return articles.order_by("-pubdate")[:20]
 
     def item_title(self, item):
         """article title"""
@@ -61,7 +108,7 @@ class ArticleFeed(Feed):
         return categories
 
 
-class EventFeed(Feed):
+class EventFeed(CachedFeed):
     """Combined feed for all events and calls for papers"""
 
     feed_type = Atom1Feed
@@ -75,31 +122,21 @@ class EventFeed(Feed):
     def items(self):
         """event and CFP items for the feed"""
 
-        events = models.Event.objects.filter(approved=True)
-        cfps = models.CallForPapers.objects.all()
-
-        result_list = sorted(
-            chain(events, cfps),
-            key=attrgetter("pubdate"),
-            reverse=True,
-        )
-        return result_list[:20]
+        return models.ContentItem.objects.filter(
+            kind__in=[models.ContentKind.EVENT, models.ContentKind.CFP]
+        ).order_by("-pubdate")[:20]
 
     def item_title(self, item):
         """event or CFP name"""
-        return item.name
+        return item.title
 
     def item_description(self, item):
         """description or details"""
-        return (
-            item.description
-            if hasattr(item, "description")
-            else item.details if hasattr(item, "details") else None
-        )
+        return item.description
 
     def item_link(self, item):
         """item url"""
-        return item.url if hasattr(item, "url") else item.event.url
+        return item.url
 
     def item_pubdate(self, item):
         """date event/CFP was registered"""
@@ -107,11 +144,10 @@ class EventFeed(Feed):
 
     def item_categories(self, item):
         """event GLAMR category"""
-        if hasattr(item, "category"):
-            return [models.Category(item.category).label]
+        return item.categories or None
 
 
-class EditionFeed(Feed):
+class EditionFeed(CachedFeed):
     """Newsletter editions"""
 
     feed_type = Atom1Feed
@@ -124,7 +160,8 @@ class EditionFeed(Feed):
 
     def items(self):
         """each article in the feed"""
-        return models.Edition.objects.order_by("-pubdate")[:20]
+        editions = models.Edition.objects.select_related("newsletter")
+        return editions.order_by("-pubdate")[:20]
 
     def item_title(self, item):
         """article title"""
@@ -155,7 +192,7 @@ class EditionFeed(Feed):
         return [models.Category(item.newsletter.category).label]
 
 
-class CombinedFeed(Feed):
+class CombinedFeed(CachedFeed):
     """Combined Atom feed for everything"""
 
     feed_type = Atom1Feed
@@ -180,81 +217,36 @@ class CombinedFeed(Feed):
     def items(self):
         """items for the feed"""
 
-        blog_objects = models.Blog.objects.filter(
-            approved=True, suspended=False, active=True
-        )
-
-        posts = models.Article.objects.all()
-
-        newsletters = models.Newsletter.objects.filter(approved=True, active=True)
-
-        editions = models.Edition.objects.all()
-
-        groups = models.Group.objects.filter(approved=True)
-
-        events = models.Event.objects.filter(approved=True)
-
-        cfps = models.CallForPapers.objects.all()
-
-        result_list = sorted(
-            chain(blog_objects, posts, newsletters, editions, groups, events, cfps),
-            key=attrgetter("pubdate"),
-            reverse=True,
-        )
-
-        return result_list[:30]
+        return models.ContentItem.objects.order_by("-pubdate")[:30]
 
     def item_title(self, item):
         """title or name"""
-        return item.name if hasattr(item, "name") else item.title
+        return item.title
 
     def item_description(self, item):
         """description"""
-        return (
-            item.description
-            if hasattr(item, "description")
-            else item.details if hasattr(item, "details") else None
-        )
+        return item.description
 
     def item_link(self, item):
         """item url"""
-        return item.url if hasattr(item, "url") else item.event.url
+        return item.url
 
     def item_guid(self, item):
         """guid"""
-
-        return item.url if hasattr(item, "url") else f"{item.event.url}-cfp-{item.id}"
+        return item.guid
 
     def item_author_name(self, item):
         """author"""
-        return getattr(item, "author_name", None)
+        return item.author_name
 
     def item_pubdate(self, item):
         """date item was published"""
-
-        pubdate = getattr(item, "pubdate", None)
-        return pubdate
+        return item.pubdate
 
     def item_updateddate(self, item):
         """updated date"""
-        if hasattr(item, "updateddate"):
-            return item.updateddate
-
-        if hasattr(item, "pubdate"):
-            return item.pubdate
-
-        return None
+        return item.updateddate or item.pubdate
 
     def item_categories(self, item):
         """GLAMR category or tags"""
-
-        if hasattr(item, "category"):
-            return [models.Category(item.category).label]
-
-        if hasattr(item, "tags"):
-            categories = []
-            for tag in item.tags.all():
-                categories.append(tag.name)
-            return categories
-
-        return None
+        return item.categories or None
@@ -1,22 +1,20 @@
 """public views (no need to log in)"""
 
 # pylint: disable=R6301
-from itertools import chain
-from operator import attrgetter
 
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.contrib.postgres.search import SearchRank, SearchVector
 from django.utils.translation import gettext_lazy as _
 from django.core.mail import EmailMessage
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.db.models import Prefetch
 from django.shortcuts import render, redirect
 from django.utils import timezone
 from django.views import View
 
 from blogs import forms, models
+from blogs.pagination import get_keyset_page
+from blogs.search import load_results, search
 from blogs.utilities import get_blog_info, get_webfinger_subscribe_uri
 
 
@@ -60,7 +58,11 @@ class Articles(View):
 
     def get(self, request):
         """here they are"""
-        latest = models.Article.objects.order_by("-pubdate")[:10]
+        latest = get_keyset_page(
+            models.Article.objects.select_related("blog").prefetch_related("tags"),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
 
         data = {"title": "Latest blog posts", "latest": latest}
         return render(request, "browse/articles.html", data)
@@ -73,6 +75,15 @@ class Events(View):
         """here they are"""
         now = timezone.now()
 
+        # open calls for papers for every event in one query, soonest first
+        open_cfps = Prefetch(
+            "cfp",
+            queryset=models.CallForPapers.objects.filter(
+                closing_date__gte=now
+            ).order_by("closing_date"),
+            to_attr="open_cfps",
+        )
+
         if category:
             cons = models.Event.objects.filter(
                 approved=True, start_date__gte=now, category=category
@@ -82,13 +93,11 @@ class Events(View):
                 approved=True, start_date__gte=now
             ).order_by("start_date")
 
+        cons = cons.prefetch_related(open_cfps)
+
         for con in cons:
             con.category_name = models.Category(con.category).label
-            con.call_for_papers = (
-                con.cfp.filter(closing_date__gte=timezone.now())
-                .order_by("-closing_date")
-                .last()
-            )
+            con.call_for_papers = con.open_cfps[0] if con.open_cfps else None
 
         data = {"title": "Upcoming events", "cons": cons, "category": category}
         return render(request, "browse/events.html", data)
@@ -100,9 +109,11 @@ class CallsForPapers(View):
     def get(self, request):
         """here they are"""
         now = timezone.now()
-        cfps = models.CallForPapers.objects.filter(
-            approved=True, closing_date__gte=now
-        ).order_by("closing_date")
+        cfps = (
+            models.CallForPapers.objects.filter(approved=True, closing_date__gte=now)
+            .select_related("event")
+            .order_by("closing_date")
+        )
         data = {"title": "Calls for Papers open now", "cfps": cfps}
         return render(request, "browse/cfp.html", data)
 
@@ -155,7 +166,11 @@ class Editions(View):
 
     def get(self, request):
         """here they are"""
-        latest = models.Edition.objects.order_by("-pubdate")[:10]
+        latest = get_keyset_page(
+            models.Edition.objects.select_related("newsletter"),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+        )
 
         data = {"title": "Latest newsletter editions", "latest": latest}
         return render(request, "browse/editions.html", data)
@@ -338,94 +353,11 @@ class Search(View):
 
         query = request.GET.get("q")
 
-        article_vector = (
-            SearchVector("tagnames", weight="A")
-            + SearchVector("title", weight="B")
-            + SearchVector("description", weight="C")
-        )
-
-        articles = (
-            models.Article.objects.annotate(
-                tagnames=ArrayAgg(
-                    "tags__name", distinct=True
-                ),  # see above: this prevents many-to-many objects like tags causing the same article to appear in the results multiple times
-                rank=SearchRank(article_vector, query),
-            )
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        conference_vector = SearchVector("name", weight="A") + SearchVector(
-            "description", weight="C"
-        )
-
-        events = (
-            models.Event.objects.filter(approved=True)
-            .annotate(rank=SearchRank(conference_vector, query))
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        cfp_vector = SearchVector("name", weight="B") + SearchVector(
-            "details", weight="C"
-        )
-
-        cfps = (
-            models.CallForPapers.objects.filter(approved=True)
-            .annotate(rank=SearchRank(cfp_vector, query))
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        news_vector = SearchVector("name", weight="A") + SearchVector(
-            "description", weight="C"
-        )
-
-        newsletters = (
-            models.Newsletter.objects.filter(approved=True)
-            .annotate(rank=SearchRank(news_vector, query))
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        edn_vector = SearchVector("title", weight="A") + SearchVector(
-            "description", weight="C"
-        )
-
-        editions = (
-            models.Edition.objects.filter()
-            .annotate(rank=SearchRank(edn_vector, query))
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        group_vector = SearchVector("name", weight="A") + SearchVector(
-            "description", weight="C"
-        )
-
-        groups = (
-            models.Group.objects.filter(approved=True)
-            .annotate(rank=SearchRank(group_vector, query))
-            .filter(rank__gte=0.1)
-            .order_by("-rank")
-        )
-
-        combined = sorted(
-            chain(articles, events, editions, cfps, newsletters, groups),
-            key=attrgetter("rank"),
-            reverse=True,
-        )
-
-        for item in combined:
-            if hasattr(item, "category"):
-                item.category_name = models.Category(item.category).label
-            if hasattr(item, "event"):
-                item.category = models.Category(item.event.category)
-                item.category_name = models.Category(item.event.category).label
-
-        paginator = Paginator(combined, 10)
+        # only the rows for this page are loaded
+        paginator = Paginator(search(query), 10)
         page_number = request.GET.get("page")
         paged = paginator.get_page(page_number)
+        paged.object_list = load_results(paged.object_list)
 
         data = {"title": "Search Aus GLAMR", "items": paged, "query": query}
 
@@ -439,14 +371,16 @@ class Browse(View):
         """display browse results"""
 
         query = request.GET.get("q")
-        results = models.Article.objects.filter(tags__name=query).order_by("-pubdate")
-        trending = models.Tag.objects.annotate(count=Count("articles")).order_by(
-            "-count"
-        )[:10]
+        results = (
+            models.Article.objects.filter(tags__name=query)
+            .select_related("blog")
+            .prefetch_related("tags")
+        )
+        trending = models.Tag.objects.order_by("-total", "name")[:10]
 
-        paginator = Paginator(results, 10)
-        page_number = request.GET.get("page")
-        paged = paginator.get_page(page_number)
+        paged = get_keyset_page(
+            results, after=request.GET.get("after"), before=request.GET.get("before")
+        )
 
         data = {
             "title": f"Articles tagged '{query}'",